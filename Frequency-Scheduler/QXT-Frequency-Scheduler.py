@@ -1,90 +1,466 @@
 #!/usr/bin/env python3
-import argparse
-import datetime as dt
-import json
+import asyncio
+import errno
+import gc
+import ipaddress
+import os
+import pathlib
+import select
+import signal
 import socket
+import sys
 import time
+import types
+from contextlib import contextmanager
 from typing import Tuple
 
 def parse_hhmm(s: str) -> Tuple[int, int]:
     h, m = s.split(":")
     return int(h), int(m)
 
-def in_day_window(now: dt.datetime, start: str, end: str) -> bool:
-    sh, sm = parse_hhmm(start)
-    eh, em = parse_hhmm(end)
-    start_t = now.replace(hour=sh, minute=sm, second=0, microsecond=0)
-    end_t   = now.replace(hour=eh, minute=em, second=0, microsecond=0)
-    if start_t <= end_t:
-        return start_t <= now <= end_t
-    else:
-        # ventana que cruza medianoche (p. ej. 20:00–06:00)
-        return now >= start_t or now <= end_t
+def build_day_mask(sh: int, sm: int, eh: int, em: int) -> int:
+    """Bitmap de 1440 bits: el bit i vale 1 si el minuto i del día es 'día'."""
+    start_min = sh * 60 + sm
+    end_min   = eh * 60 + em
+    if start_min <= end_min:
+        return ((1 << (end_min - start_min + 1)) - 1) << start_min
+    # ventana que cruza medianoche: [start, 1439] ∪ [0, end]
+    return (((1 << (1440 - start_min)) - 1) << start_min) | ((1 << (end_min + 1)) - 1)
+
+def seconds_to_boundary(sod: int, sh: int, sm: int, eh: int, em: int) -> int:
+    """Segundos desde 'sod' (segundo local del día) hasta el próximo cambio día/noche."""
+    n = sod // 60
+    # El minuto 'end' es aún de día: el cambio a noche llega al minuto siguiente
+    ahead = min((m - n) % 1440 or 1440 for m in (sh * 60 + sm, (eh * 60 + em + 1) % 1440))
+    return ahead * 60 - sod % 60
+
+# Desfase local fijo si la zona horaria no tiene horario de verano; si lo tiene,
+# se consulta time.localtime() en cada llamada para seguir los cambios de hora
+FIXED_UTC_OFFSET = None if time.daylight else time.localtime().tm_gmtoff
+
+def local_seconds_of_day() -> int:
+    """Segundo local del día (0..86399) sin construir un datetime."""
+    if FIXED_UTC_OFFSET is not None:
+        return (int(time.time()) + FIXED_UTC_OFFSET) % 86400
+    t = time.localtime()
+    return min(t.tm_hour * 3600 + t.tm_min * 60 + t.tm_sec, 86399)  # tm_sec puede ser 60
+
+# Mensaje RIG.SET_FREQ ya serializado: solo varía el valor en Hz
+SET_FREQ_TMPL = b'{"type":"RIG.SET_FREQ","value":%d}\n'
+
+# Sufijo → multiplicador (orden importa: 'mhz'/'khz' antes que 'hz')
+FREQ_SUFFIX = {"mhz": 1_000_000, "khz": 1_000, "hz": 1}
 
 def parse_freq_to_hz(s: str) -> int:
     s = str(s).strip().lower()
-    if s.endswith("mhz"):
-        return int(round(float(s[:-3]) * 1_000_000))
-    if s.endswith("khz"):
-        return int(round(float(s[:-3]) * 1_000))
-    if s.endswith("hz"):
-        return int(round(float(s[:-2])))
+    if s[-1:] == "z":
+        for suf, mult in FREQ_SUFFIX.items():
+            if s.endswith(suf):
+                return int(round(float(s[:-len(suf)]) * mult))
     # sin sufijo: si es >=1000 asumimos Hz; si no, MHz
+    if s.isdigit() and int(s) >= 1000:
+        return int(s)  # Hz enteros: sin pasar por float
     val = float(s)
     return int(round(val if val >= 1000 else val * 1_000_000))
 
-def js8call_set_freq(freq_hz: int, host: str, port: int, timeout=2.5) -> None:
+# Última frecuencia aplicada (para no repetir envíos idénticos en one-shot).
+# Un fichero por instancia de JS8Call: host/puerto o socket UNIX
+STATE_DIR = pathlib.Path(os.path.expanduser("~/.cache"))
+
+def state_file(host: str, port: int, unix_path=None) -> pathlib.Path:
+    endpoint = unix_path or f"{host}_{port}"
+    safe = "".join(c if c.isalnum() or c in "-." else "_" for c in endpoint)
+    return STATE_DIR / f"qxt-js8-freq-{safe}"
+
+def load_last(path: pathlib.Path):
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+def save_last(path: pathlib.Path, freq_hz: int) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(f"{freq_hz}\n")
+        os.replace(tmp, path)  # escritura atómica
+    except OSError:
+        pass
+
+# Salida de estado: stderr en binario, un write + flush por mensaje y sin
+# repetir el mismo mensaje dos veces seguidas. --quiet la silencia.
+QUIET = False
+_last_log = None
+
+def log(msg: str) -> None:
+    global _last_log
+    if QUIET or msg == _last_log:
+        return
+    _last_log = msg
+    out = getattr(sys.stderr, "buffer", None)
+    if out is None:  # p. ej. pythonw sin consola
+        return
+    out.write(msg.encode("utf-8", "replace") + b"\n")
+    out.flush()
+
+@contextmanager
+def gc_paused():
+    """Evita una pausa del GC justo durante el envío (latencia en el umbral)."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+class JS8Conn:
     """
-    Cambia la frecuencia en JS8Call vía su API TCP (Help → API).
-    Ajusta 'type' si tu build usa otro identificador.
+    Conexión TCP persistente con la API de JS8Call (Help → API).
+    Se abre en el primer envío y se reutiliza; si falla, se reconecta una vez.
+    Los comandos se encolan con queue() y salen juntos en un único sendall()
+    al llamar a flush() (o en un único write() + drain() con aflush() desde
+    asyncio, en modo --watch).
     """
-    payload = {"type": "RIG.SET_FREQ", "value": freq_hz}
-    msg = (json.dumps(payload) + "\n").encode("utf-8")
-    with socket.create_connection((host, port), timeout=timeout) as sock:
-        sock.sendall(msg)
+    def __init__(self, host: str, port: int, timeout=2.5, unix_path=None):
+        self.host = host
+        self.port = port
+        # Socket UNIX local (JS8Call o un proxy local): evita la pila TCP/IP
+        self.unix_path = unix_path
+        self.timeout = timeout
+        self.sock = None
+        self._buf = []
+        self.reader = None
+        self.writer = None
+        self._reader_task = None  # tarea que consume las respuestas (modo asyncio)
+        # Host numérico (lo habitual: 127.0.0.1): conectamos sin getaddrinfo
+        try:
+            ip = ipaddress.ip_address(host)
+            self._family = socket.AF_INET6 if ip.version == 6 else socket.AF_INET
+        except ValueError:
+            self._family = None
+
+    def _connect_numeric(self) -> socket.socket:
+        # connect no bloqueante + select: plazo de conexión acotado a 'timeout'
+        sock = socket.socket(self._family, socket.SOCK_STREAM)
+        try:
+            sock.setblocking(False)
+            err = sock.connect_ex((self.host, self.port))
+            if err in (errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, "WSAEWOULDBLOCK", -1)):
+                _, w, x = select.select([], [sock], [sock], self.timeout)
+                if not w and not x:
+                    raise TimeoutError(f"JS8Call API {self.host}:{self.port}: timeout al conectar")
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                raise OSError(err, os.strerror(err))
+            sock.settimeout(self.timeout)
+            return sock
+        except BaseException:
+            sock.close()
+            raise
+
+    def _connect_unix(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.unix_path)
+            return sock
+        except BaseException:
+            sock.close()
+            raise
+
+    def _connect(self) -> socket.socket:
+        if self.unix_path:
+            sock = self._connect_unix()
+        else:
+            if self._family is not None:
+                sock = self._connect_numeric()
+            else:
+                sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            # Mensajes de ~40 bytes: sin Nagle para no esperar hasta 40 ms
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.sock = sock
+        return sock
+
+    def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def sendall(self, msg: bytes) -> None:
+        sock = self.sock or self._connect()
+        try:
+            sock.sendall(msg)
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            # JS8Call reiniciado o socket caído: reconectamos y reintentamos una vez
+            self.close()
+            self._connect().sendall(msg)
+
+    def queue(self, msg: bytes) -> None:
+        self._buf.append(msg)
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        data = b"".join(self._buf)
+        self._buf.clear()
+        self.sendall(data)
         # Si tu JS8Call devuelve algo por el socket, podrías leerlo aquí:
-        # _ = sock.recv(4096)
+        # _ = self.sock.recv(4096)
 
-def main():
+    async def _aopen(self) -> None:
+        # Conexión dentro del bucle (getaddrinfo y connect incluidos), con el mismo
+        # plazo que el modo síncrono: mientras tanto siguen atendiéndose las señales
+        if self.unix_path:
+            opening = asyncio.open_unix_connection(self.unix_path)
+        else:
+            opening = asyncio.open_connection(self.host, self.port)
+        try:
+            self.reader, self.writer = await asyncio.wait_for(opening, self.timeout)
+        except asyncio.TimeoutError:
+            endpoint = self.unix_path or f"{self.host}:{self.port}"
+            raise TimeoutError(f"JS8Call API {endpoint}: timeout al conectar") from None
+        if not self.unix_path:
+            # asyncio ya desactiva Nagle en TCP; falta el keepalive del modo síncrono
+            sock = self.writer.get_extra_info("socket")
+            if sock is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Se guarda la referencia: una tarea sin referencias puede ser recolectada a medias
+        self._reader_task = asyncio.create_task(self._read_replies(self.reader))
+
+    async def _read_replies(self, reader: asyncio.StreamReader) -> None:
+        # JS8Call puede enviar eventos/respuestas por el socket: se consumen en
+        # cuanto llegan para no llenar el buffer, y si lo cierra lo detectamos
+        try:
+            while await reader.readline():
+                pass
+        except (ConnectionError, OSError):
+            pass
+        except Exception as e:
+            log(f"[JS8Call] Error leyendo respuestas de la API: {e}")
+        if self.reader is reader:
+            self._reader_task = None  # es esta misma tarea: close() no debe cancelarla
+            self.close()  # la próxima escritura reconecta
+
+    async def aflush(self) -> None:
+        if not self._buf:
+            return
+        data = b"".join(self._buf)
+        self._buf.clear()
+        for attempt in (0, 1):
+            try:
+                if self.writer is None:
+                    await self._aopen()
+                # Sin GC solo durante el write síncrono: drain() puede esperar
+                # a un socket lento y mientras tanto el resto de tareas sigue con GC
+                with gc_paused():
+                    self.writer.write(data)
+                await self.writer.drain()
+                return
+            except (BrokenPipeError, ConnectionResetError, OSError):
+                # JS8Call reiniciado o socket caído: reconectamos y reintentamos una vez
+                self.close()
+                if attempt:
+                    raise
+
+    def set_freq(self, freq_hz: int) -> None:
+        """
+        Encola el cambio de frecuencia en JS8Call (se envía en flush()).
+        Ajusta 'type' si tu build usa otro identificador.
+        """
+        self.queue(SET_FREQ_TMPL % freq_hz)
+
+# Opciones de línea de comandos. El caso normal (cron/systemd) se parsea a mano
+# sin importar argparse; --help o cualquier error pasan al parser completo.
+DEFAULTS = {
+    "day_start": "08:00", "day_end": "20:00", "day_freq": None, "night_freq": None,
+    "host": "127.0.0.1", "port": 2442, "unix_socket": None, "watch": False, "force": False,
+    "interval": 60, "pin_cpu": None, "debounce_secs": 2.0, "quiet": False,
+}
+VALUE_OPTS = {
+    "--day-start": str, "--day-end": str, "--day-freq": str, "--night-freq": str,
+    "--host": str, "--port": int, "--unix-socket": str, "--interval": int, "--pin-cpu": int, "--debounce-secs": float,
+}
+FLAG_OPTS = ("--watch", "--force", "--quiet")
+REQUIRED = ("day_freq", "night_freq")
+
+def build_arg_parser():
+    import argparse
     ap = argparse.ArgumentParser(
         description="Cambia la frecuencia en JS8Call según horario (día/noche) usando solo la API de JS8Call."
     )
-    ap.add_argument("--day-start", default="08:00", help="Inicio de día (HH:MM) local. Ej: 08:00")
-    ap.add_argument("--day-end",   default="20:00", help="Fin de día (HH:MM) local. Ej: 20:00")
+    ap.set_defaults(**DEFAULTS)
+    ap.add_argument("--day-start", help="Inicio de día (HH:MM) local. Ej: 08:00")
+    ap.add_argument("--day-end",   help="Fin de día (HH:MM) local. Ej: 20:00")
     ap.add_argument("--day-freq",  required=True,   help="Frecuencia diurna (Hz/kHz/MHz). Ej: 14.078 o 14078000")
     ap.add_argument("--night-freq",required=True,   help="Frecuencia nocturna (Hz/kHz/MHz). Ej: 7.078 o 7078000")
-    ap.add_argument("--host",      default="127.0.0.1", help="Host API JS8Call")
-    ap.add_argument("--port",      type=int, default=2442, help="Puerto API JS8Call")
+    ap.add_argument("--host",      help="Host API JS8Call")
+    ap.add_argument("--port",      type=int, help="Puerto API JS8Call")
+    ap.add_argument("--unix-socket", metavar="PATH",
+                    help="Socket UNIX local de la API (en lugar de --host/--port)")
     ap.add_argument("--watch",     action="store_true", help="Bucle: vigila y cambia al cruzar umbral")
-    ap.add_argument("--interval",  type=int, default=60, help="Segundos entre comprobaciones en --watch")
-    args = ap.parse_args()
+    ap.add_argument("--force",     action="store_true", help="One-shot: envía aunque la frecuencia ya estuviera aplicada")
+    ap.add_argument("--quiet",     action="store_true", help="No mostrar mensajes de estado")
+    ap.add_argument("--interval",  type=int,
+                    help="Máx. segundos entre comprobaciones en --watch; despierta antes si llega un umbral (def: 60)")
+    ap.add_argument("--pin-cpu",   type=int, metavar="N",
+                    help="Linux: fija el proceso a la CPU N para reducir la latencia de cola")
+    ap.add_argument("--debounce-secs", type=float,
+                    help="Segundos que el cambio debe mantenerse estable antes de enviarlo en --watch (def: 2)")
+    return ap
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    ns = dict(DEFAULTS)
+    try:
+        it = iter(argv)
+        for arg in it:
+            opt, eq, val = arg.partition("=")
+            if opt in VALUE_OPTS:
+                ns[opt[2:].replace("-", "_")] = VALUE_OPTS[opt](val if eq else next(it))
+            elif arg in FLAG_OPTS:
+                ns[arg[2:]] = True
+            else:
+                raise ValueError(arg)  # -h/--help, abreviaturas u opciones desconocidas
+        if any(ns[k] is None for k in REQUIRED):
+            raise ValueError("faltan opciones obligatorias")
+    except (ValueError, StopIteration):
+        return build_arg_parser().parse_args(argv)
+    return types.SimpleNamespace(**ns)
+
+def main():
+    global QUIET
+    args = parse_args()
+    QUIET = args.quiet
+
+    if args.pin_cpu is not None:
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, {args.pin_cpu})
+            except (OSError, ValueError) as e:
+                log(f"[JS8Call] No se pudo fijar la CPU {args.pin_cpu} ({e}), se ignora --pin-cpu")
+        else:
+            log("[JS8Call] --pin-cpu solo está soportado en Linux, se ignora")
 
     day_freq_hz   = parse_freq_to_hz(args.day_freq)
     night_freq_hz = parse_freq_to_hz(args.night_freq)
+    # Los umbrales no cambian durante la ejecución: se parsean una sola vez
+    dsh, dsm = parse_hhmm(args.day_start)
+    deh, dem = parse_hhmm(args.day_end)
 
-    def target_freq(now: dt.datetime) -> int:
-        return day_freq_hz if in_day_window(now, args.day_start, args.day_end) else night_freq_hz
+    day_mask = build_day_mask(dsh, dsm, deh, dem)
+    # Frecuencia objetivo precalculada para los 1440 minutos del día
+    freq_by_minute = tuple(day_freq_hz if (day_mask >> i) & 1 else night_freq_hz for i in range(1440))
 
-    last_applied = None
+    def target_freq(minute_of_day: int) -> int:
+        return freq_by_minute[minute_of_day]
+
+    # Solo hay dos mensajes posibles: se serializan una vez al arrancar
+    set_freq_msg = {hz: SET_FREQ_TMPL % hz for hz in (day_freq_hz, night_freq_hz)}
+
+    if args.unix_socket and not hasattr(socket, "AF_UNIX"):
+        log("[JS8Call] --unix-socket no está soportado en este sistema, se usa TCP")
+        args.unix_socket = None
+    conn = JS8Conn(args.host, args.port, unix_path=args.unix_socket)
+    last_file = state_file(args.host, args.port, args.unix_socket)
 
     if not args.watch:
-        now = dt.datetime.now()
-        freq = target_freq(now)
-        js8call_set_freq(freq, args.host, args.port)
-        print(f"[JS8Call] Frecuencia puesta a {freq} Hz")
+        freq = target_freq(local_seconds_of_day() // 60)
+        if not args.force and freq == load_last(last_file):
+            log(f"[JS8Call] Frecuencia ya en {freq} Hz según el último envío, nada que hacer (usa --force para reenviarla)")
+            return
+        conn.queue(set_freq_msg[freq])
+        with gc_paused():
+            conn.flush()
+        conn.close()
+        save_last(last_file, freq)
+        log(f"[JS8Call] Frecuencia puesta a {freq} Hz")
         return
 
+    async def watch() -> None:
+        # Un solo temporizador hasta el próximo plazo; SIGINT/SIGTERM despiertan al instante
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: nos queda KeyboardInterrupt
+
+        last_applied = None
+        pending_freq = None
+        pending_since = 0.0
+        # Cada espera dura como mucho 'interval' y en cada despertar se recalcula
+        # con la hora de pared: así un suspend o un cambio de hora se corrige enseguida
+        # (el reloj monótono no avanza durante el suspend)
+        max_wait = max(1, args.interval)
+        backoff = 1.0
+        max_backoff = float(max_wait)
+
+        try:
+            while not stop.is_set():
+                sod = local_seconds_of_day()
+                mono = time.monotonic()
+                freq = target_freq(sod // 60)
+                # Antirrebote: el nuevo objetivo debe mantenerse 'debounce_secs'
+                # antes de enviarse (el primer ajuste al arrancar es inmediato)
+                sleep_s = None
+                if freq != last_applied and last_applied is not None:
+                    if freq != pending_freq:
+                        pending_freq, pending_since = freq, mono
+                    wait_s = args.debounce_secs - (mono - pending_since)
+                    if wait_s > 0:
+                        sleep_s = wait_s
+                if sleep_s is None and freq != last_applied:
+                    conn.queue(set_freq_msg[freq])
+                    # El envío (y la conexión, si hace falta) compite con la señal de parada
+                    flush = asyncio.create_task(conn.aflush())
+                    stopping = asyncio.create_task(stop.wait())
+                    await asyncio.wait((flush, stopping), return_when=asyncio.FIRST_COMPLETED)
+                    stopping.cancel()
+                    if not flush.done():
+                        flush.cancel()
+                        break
+                    try:
+                        flush.result()
+                    except OSError as e:
+                        # JS8Call caído o reiniciándose: reintentamos con espera
+                        # exponencial sin dar por aplicada la frecuencia
+                        log(f"[JS8Call] Error enviando a la API ({e}), reintento en {backoff:.0f} s")
+                        sleep_s = backoff
+                        backoff = min(backoff * 2, max_backoff)
+                    else:
+                        log(f"[JS8Call] Frecuencia puesta a {freq} Hz")
+                        last_applied = freq
+                        save_last(last_file, freq)  # lo ve un one-shot posterior
+                        backoff = 1.0
+                if sleep_s is None:
+                    pending_freq = None
+                    # Hasta el próximo umbral día/noche, sin pasar de 'interval'
+                    to_boundary = max(1, seconds_to_boundary(sod, dsh, dsm, deh, dem))
+                    sleep_s = min(to_boundary, max_wait)
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=sleep_s)
+                except asyncio.TimeoutError:
+                    pass
+            log("Saliendo...")
+        finally:
+            conn.close()
+
     try:
-        while True:
-            now = dt.datetime.now()
-            freq = target_freq(now)
-            if freq != last_applied:
-                js8call_set_freq(freq, args.host, args.port)
-                print(f"[JS8Call] Frecuencia puesta a {freq} Hz")
-                last_applied = freq
-            time.sleep(args.interval)
+        asyncio.run(watch())
     except KeyboardInterrupt:
-        print("Saliendo...")
+        log("Saliendo...")
 
 if __name__ == "__main__":
     main()
@@ -11,52 +11,104 @@ con heartbeat/reconexión automática del sender JS8Call
 """
 
 import argparse
+import asyncio
+import hashlib
 import json
 import logging
 import re
+import selectors
+import signal
 import socket
 import sys
 import threading
 import time
+from collections import OrderedDict, deque
 from datetime import datetime
 from typing import Optional, Tuple, Dict, Any, List
 
+# msgspec (opcional): única vía rápida de JSON; decodifica los eventos JS8
+# directamente a un Struct tipado y codifica los frames de salida. Sin él, json stdlib.
+try:
+    import msgspec
+except Exception:
+    msgspec = None
+
+# uvloop (opcional): bucle de eventos más rápido para el listener
+try:
+    import uvloop
+except Exception:
+    uvloop = None
+
 
 # ───────────── Utilidades ─────────────
 
+# NBSP → espacio y fuera los zero-width (ZWSP/ZWNJ/ZWJ), en una sola pasada
+_NORM_TABLE = str.maketrans({0x00A0: " ", 0x200B: None, 0x200C: None, 0x200D: None})
+
+
 def normalize_text(s: str) -> str:
     if not isinstance(s, str):
         return s
-    s = s.replace("\u00A0", " ")
-    s = s.replace("\u200B", "").replace("\u200C", "").replace("\u200D", "")
-    return s.strip()
+    if s.isascii():
+        # caso habitual: nada que traducir (la tabla solo tiene caracteres no ASCII)
+        return s.strip()
+    return s.translate(_NORM_TABLE).strip()
 
 
-CALLPREFIX_RE = re.compile(r"^\s*[A-Z0-9/]{3,}:\s*")
+_CALLSIGN_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789/")
 
 
 def strip_leading_callsign(s: str) -> str:
-    return CALLPREFIX_RE.sub("", s, count=1)
+    """Quita un prefijo "CALL: " inicial (3+ caracteres A-Z0-9/ y dos puntos)."""
+    s2 = s.lstrip()
+    i = s2.find(":")
+    if i >= 3 and _CALLSIGN_CHARS.issuperset(s2[:i]):
+        return s2[i + 1:].lstrip()
+    return s
 
 
-AT_RE_STRICT = re.compile(r"^@(?P<tag>\S+)(?:\s+(?P<body>.*))?$")
 AT_RE_LOOSE = re.compile(r"@(?P<tag>\S+)(?:\s+(?P<body>.*))?")
 
 
 def parse_routes(route_items: List[str]) -> Dict[str, List[str]]:
     out: Dict[str, List[str]] = {}
     for item in route_items or []:
-        if "=" not in item:
+        tag, sep, value = item.partition("=")
+        if not sep:
             logging.getLogger("bridge").warning("Ignoring invalid route (TAG=value): %r", item)
             continue
-        tag, value = item.split("=", 1)
-        tag = (tag or "").strip().lower()
-        value = (value or "").strip()
+        tag = tag.strip().lower()
+        value = value.strip()
         if tag and value:
             out.setdefault(tag, []).append(value)
     return out
 
 
+def json_loads_bytes(line: bytes) -> Any:
+    """JSON desde bytes con json stdlib, tolerante a UTF-8 inválido (vía lenta/de respaldo)."""
+    return json.loads(line.decode("utf-8", errors="ignore"))
+
+
+_JSON_ENCODER = msgspec.json.Encoder() if msgspec is not None else None
+
+
+def json_dumps_bytes(obj: Any) -> bytes:
+    """JSON en bytes UTF-8, sin salto de línea (msgspec si está disponible)."""
+    if _JSON_ENCODER is not None:
+        return _JSON_ENCODER.encode(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def json_dumps_line(obj: Any) -> bytes:
+    """Frame JSON terminado en \\n, en bytes UTF-8."""
+    return json_dumps_bytes(obj) + b"\n"
+
+
+# sendmsg (scatter/gather) no existe en Windows; MSG_NOSIGNAL solo en Linux
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+_MSG_NOSIGNAL = getattr(socket, "MSG_NOSIGNAL", 0)
+
+
 def now_hms() -> str:
     return datetime.now().strftime("%H:%M:%S")
 
@@ -103,14 +155,25 @@ def create_tcp_interface(host: str, port: int):
 # ───────────── ACK Tracker ─────────────
 
 class AckTracker:
+    __slots__ = ("timeout", "_pending", "_order", "_lock", "_cv")
+
     def __init__(self, timeout_sec: int = 30):
         self.timeout = timeout_sec
         self._pending: Dict[int, Dict[str, Any]] = {}
-        self._lock = threading.RLock()
+        # (ts, rid) en orden de alta == orden temporal: el barrido solo mira el frente
+        self._order: deque = deque()
+        self._lock = threading.Lock()
+        # avisa al watchdog de altas nuevas (comparte el lock)
+        self._cv = threading.Condition(self._lock)
 
     def add(self, request_id: int, text: str):
+        rid = int(request_id)
+        ts = time.monotonic()
         with self._lock:
-            self._pending[int(request_id)] = {'ts': time.time(), 'text': text}
+            self._pending[rid] = {'ts': ts, 'text': text}
+            self._order.append((ts, rid))
+            if len(self._order) == 1:
+                self._cv.notify()
 
     def confirm(self, request_id: Optional[int]):
         if request_id is None:
@@ -119,129 +182,224 @@ class AckTracker:
         with self._lock:
             return self._pending.pop(rid, None)
 
-    def sweep_timeouts(self):
-        now = time.time()
+    def _sweep_locked(self, now: float):
         expired = []
-        with self._lock:
-            for rid, info in list(self._pending.items()):
-                if now - info['ts'] > self.timeout:
-                    expired.append((rid, info))
-                    self._pending.pop(rid, None)
+        order = self._order
+        while order and now - order[0][0] >= self.timeout:
+            ts, rid = order.popleft()
+            info = self._pending.get(rid)
+            # entradas ya confirmadas (o re-añadidas después) se saltan
+            if info is not None and info['ts'] == ts:
+                del self._pending[rid]
+                expired.append((rid, info))
         return expired
 
+    def wait_expired(self):
+        """
+        Bloquea hasta que venza algún ACK pendiente y devuelve [(rid, info), ...].
+        Sin pendientes duerme sin timeout; si no, justo hasta el vencimiento más próximo.
+        """
+        with self._cv:
+            while True:
+                if not self._order:
+                    self._cv.wait()
+                    continue
+                now = time.monotonic()
+                delay = self._order[0][0] + self.timeout - now
+                if delay > 0:
+                    self._cv.wait(delay)
+                    continue
+                expired = self._sweep_locked(now)
+                if expired:
+                    return expired
+
 
 # ───────────── JS8: RX (listener) ─────────────
 
+class _JS8LineProtocol(asyncio.BufferedProtocol):
+    """
+    Protocolo TCP del listener: el kernel escribe directo en un bytearray
+    preasignado (recv_into) y aquí se cortan las líneas JSON.
+    Solo se copia al acumulador la línea incompleta que queda al final.
+    """
+
+    def __init__(self, listener: "JS8Listener", handler):
+        self._listener = listener
+        self._handler = handler
+        self._rxbuf = listener._rxbuf
+        self._rxmv = listener._rxmv
+        self._partial = bytearray()
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def get_buffer(self, sizehint):
+        return self._rxmv
+
+    def buffer_updated(self, nbytes):
+        data, mv, partial = self._rxbuf, self._rxmv, self._partial
+        handle = self._listener._try_parse_and_handle
+        start = 0
+        while (nl := data.find(b"\n", start, nbytes)) != -1:
+            if partial:
+                partial += mv[start:nl]
+                line = bytes(partial)
+                partial.clear()
+            else:
+                line = bytes(mv[start:nl])
+            handle(line, self._handler)
+            start = nl + 1
+        if start < nbytes:
+            partial += mv[start:nbytes]
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+
 class JS8Listener:
+    __slots__ = ("mode", "host", "port", "buffer_size", "_stop", "_thread", "_loop", "_task",
+                 "log", "_decoder", "_rxbuf", "_rxmv")
+
     def __init__(self, mode: str, host: str, port: int, buffer_size: int = 65535, logger=None):
         self.mode = mode.lower()
         self.host = host
         self.port = port
         self.buffer_size = buffer_size
-        self.sock = None
+        # buffer de recepción TCP preasignado, reutilizado en cada lectura
+        self._rxbuf = bytearray(buffer_size)
+        self._rxmv = memoryview(self._rxbuf)
         self._stop = threading.Event()
         self._thread = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
         self.log = logger or logging.getLogger("js8.listener")
+        self._decoder = JS8_EVENT_DECODER
 
     def start(self, handler):
         if self._thread and self._thread.is_alive():
             return
-        target = self._run_udp if self.mode == "udp" else self._run_tcp
-        self._thread = threading.Thread(target=target, args=(handler,), daemon=True)
+        self._thread = threading.Thread(target=self._thread_main, args=(handler,), daemon=True)
         self._thread.start()
 
     def stop(self):
         self._stop.set()
-        try:
-            if self.sock:
-                self.sock.close()
-        except Exception:
-            pass
+        # cancela la tarea dentro de su bucle: sale al momento, sin esperar timeouts
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # bucle ya cerrado
         if self._thread:
             self._thread.join(timeout=2.0)
 
+    def _thread_main(self, handler):
+        """Hilo propio del listener con su bucle asyncio (uvloop si está instalado)."""
+        loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        coro = self._audp(handler) if self.mode == "udp" else self._atcp(handler)
+        self._task = loop.create_task(coro)
+        if self._stop.is_set():
+            self._task.cancel()
+        try:
+            loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._task = None
+            self._loop = None
+            loop.close()
+
     def _try_parse_and_handle(self, line: bytes, handler):
         """
-        Decodifica una línea (bytes) como JSON UTF-8 y llama al handler(obj).
-        Ignora silenciosamente líneas vacías o no-JSON.
+        Decodifica una línea (bytes) como objeto JSON y llama al handler(obj).
+        Con msgspec, obj es un JS8Event; si el frame no encaja en el esquema
+        (o sin msgspec) es un dict, decodificado con json stdlib.
+        Ignora silenciosamente líneas vacías, no-JSON o que no sean un objeto
+        (sin llegar al parser si no empiezan por '{').
         """
         if not line:
             return
         # limpia CR y espacios
         line = line.strip().strip(b"\r")
-        if not line:
+        # los eventos JS8 son objetos: sin '{' al inicio (keepalives, ruido) ni se intenta parsear
+        if not line or line[0] != 0x7B:
             return
         try:
-            obj = json.loads(line.decode("utf-8", errors="ignore"))
+            obj = None
+            if self._decoder is not None:
+                try:
+                    obj = self._decoder.decode(line)
+                except ValueError:
+                    # msgspec.DecodeError (fuera de esquema) y UTF-8 inválido: vía genérica
+                    obj = None
+            if obj is None:
+                obj = json_loads_bytes(line)
+                if not isinstance(obj, dict):
+                    return
         except Exception as e:
             # si quieres ver qué llegó, sube a DEBUG:
-            self.log.debug("JSON parse fail (%s) on: %r", e, line[:200])
+            if self.log.isEnabledFor(logging.DEBUG):
+                self.log.debug("JSON parse fail (%s) on: %r", e, line[:200])
             return
         try:
             handler(obj)
         except Exception as e:
             self.log.debug("Handler error: %s", e)
 
-    def _run_udp(self, handler):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.bind((self.host, self.port))
-        self.log.info("Listening JS8Call UDP on %s:%d …", self.host, self.port)
-        self.sock.settimeout(1.0)
-        while not self._stop.is_set():
-            try:
-                data, _ = self.sock.recvfrom(self.buffer_size)
+    async def _audp(self, handler):
+        listener = self
+
+        class _Proto(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
                 # JS8Call suele separar en \n; también limpiamos \r
                 for part in data.split(b"\n"):
-                    self._try_parse_and_handle(part, handler)
-            except socket.timeout:
-                continue
-            except Exception as e:
-                self.log.debug("UDP recv error: %s", e)
+                    listener._try_parse_and_handle(part, handler)
 
-    def _run_tcp(self, handler):
+            def error_received(self, exc):
+                listener.log.debug("UDP recv error: %s", exc)
+
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(_Proto, local_addr=(self.host, self.port))
+        self.log.info("Listening JS8Call UDP on %s:%d …", self.host, self.port)
+        try:
+            await loop.create_future()  # hasta stop()
+        finally:
+            transport.close()
+
+    async def _atcp(self, handler):
+        loop = asyncio.get_running_loop()
         backoff = 1.0
         while not self._stop.is_set():
+            transport = None
             try:
                 # 1) conectar
-                self.sock = socket.create_connection((self.host, self.port), timeout=5.0)
+                transport, proto = await asyncio.wait_for(
+                    loop.create_connection(lambda: _JS8LineProtocol(self, handler), self.host, self.port), 5.0)
+                sock = transport.get_extra_info("socket")
                 try:
-                    self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
                 except Exception:
                     pass
                 self.log.info("Connected to JS8Call TCP at %s:%d …", self.host, self.port)
 
-                # 2) leer bucles hasta desconexión
-                buf = b""
-                self.sock.settimeout(1.0)
+                # 2) el protocolo despacha las líneas; aquí solo se espera la desconexión
                 backoff = 1.0  # reset al conectar
-                while not self._stop.is_set():
-                    try:
-                        chunk = self.sock.recv(self.buffer_size)
-                        if not chunk:
-                            # socket cerrado por el otro lado → reconectar
-                            self.log.warning("JS8 TCP closed by peer. Reconnecting…")
-                            break
-                        buf += chunk
-                        while b"\n" in buf:
-                            line, buf = buf.split(b"\n", 1)
-                            self._try_parse_and_handle(line, handler)
-                    except socket.timeout:
-                        continue
+                exc = await proto.closed
+                if exc is not None:
+                    raise exc
+                # socket cerrado por el otro lado → reconectar
+                self.log.warning("JS8 TCP closed by peer. Reconnecting…")
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 self.log.warning("JS8 TCP loop error: %s. Reconnecting in %.1fs…", e, backoff)
             finally:
-                try:
-                    if self.sock:
-                        self.sock.close()
-                except Exception:
-                    pass
-                self.sock = None
+                if transport is not None:
+                    transport.close()
 
-            # 3) pequeña espera con backoff (máx 10s)
-            for _ in range(int(backoff * 10)):
-                if self._stop.is_set():
-                    break
-                time.sleep(0.1)
+            # 3) pequeña espera con backoff (máx 10s); stop() cancela la tarea al instante
+            await asyncio.sleep(backoff)
             backoff = min(10.0, backoff * 1.8)
 
 
@@ -262,6 +420,12 @@ class JS8Sender:
       - Hilo _rx_pump que drena frames asíncronos del socket para que no se atasque tras el primer envío.
     """
 
+    __slots__ = ("host", "port", "udp_port", "protocol", "heartbeat_secs", "log",
+                 "_sock", "_lock", "_send_mutex", "_connected",
+                 "_pump_thread", "_pump_stop", "_pump_wake", "_hb_stop", "_last_seen",
+                 "send_retries", "idle_wait", "ui_sleep", "clear_sleep", "tx_cycle_wait",
+                 "_last_free_base", "_zws_choices", "_zws_tails", "_zws_idx")
+
     def __init__(self,
                  host: str = "127.0.0.1",
                  port: int = 2442,
@@ -277,14 +441,17 @@ class JS8Sender:
         self.heartbeat_secs = heartbeat_secs
         self.log = log or logger or self._make_dummy_logger()
         self._sock: Optional[socket.socket] = None
-        self._lock = threading.RLock()
-        self._send_mutex = threading.RLock()
-        self._rx_buffer = b""
+        # Lock simple: ningún método vuelve a entrar (connect usa _close_locked)
+        self._lock = threading.Lock()
+        self._send_mutex = threading.Lock()
         self._connected = False
 
         # drenaje/pump
         self._pump_thread: Optional[threading.Thread] = None
         self._pump_stop = threading.Event()
+        # extremo de escritura del self-pipe que despierta al pump para pararlo
+        self._pump_wake: Optional[socket.socket] = None
+        self._hb_stop = threading.Event()
         self._last_seen = 0.0
 
         # tiempos
@@ -297,6 +464,8 @@ class JS8Sender:
         # anti-dedupe para FREE (cuando repites EXACTO el mismo texto)
         self._last_free_base: Optional[str] = None
         self._zws_choices = ["\u2060", "\u200A", "\u2062", "\u2009"]
+        # ya codificados como cierre del frame SET_TEXT: ZWS + '"}' + \n
+        self._zws_tails = [z.encode("utf-8") + self._SET_TEXT_END for z in self._zws_choices]
         self._zws_idx = 0
 
     # logging dummy
@@ -311,7 +480,7 @@ class JS8Sender:
     # conexión
     def connect(self, timeout: float = 3.0):
         with self._lock:
-            self.close()
+            self._close_locked()
             if self.protocol != "tcp":
                 raise ValueError("Usa TCP aquí (protocol='tcp')")
             s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -332,57 +501,109 @@ class JS8Sender:
         # hilo que lee y descarta continuamente, para que el socket no se tape
         self._pump_stop.clear()
 
+        sock = self._sock
+        rxbuf = bytearray(8192)  # preasignado: recv_into no crea un bytes por lectura
+        # self-pipe (socketpair: también vale en Windows) para despertar el select al cerrar
+        wake_r, self._pump_wake = socket.socketpair()
+
         def _pump():
-            while not self._pump_stop.is_set():
-                try:
-                    if not self._sock:
-                        time.sleep(0.05)
+            # bloquea en select (epoll/kqueue) sin timeout: solo despiertan datos o el cierre
+            sel = selectors.DefaultSelector()
+            try:
+                sel.register(sock, selectors.EVENT_READ)
+                sel.register(wake_r, selectors.EVENT_READ)
+                while True:
+                    sel.select()
+                    if self._pump_stop.is_set():
+                        break
+                    try:
+                        # nadie consume las respuestas: se leen y se tiran tal cual
+                        if sock.recv_into(rxbuf):
+                            self._last_seen = time.time()
+                            continue
+                        # JS8Call cerró la conexión: el próximo envío reconecta
+                        self.log.debug("JS8Sender: conexión cerrada por JS8Call")
+                    except BlockingIOError:
                         continue
-                    data = self._sock.recv(8192)
-                    if data:
-                        self._last_seen = time.time()
-                        # partimos por líneas; descartamos (no necesitamos procesar nada aquí)
-                        self._rx_buffer += data
-                        while b"\n" in self._rx_buffer:
-                            _line, self._rx_buffer = self._rx_buffer.split(b"\n", 1)
-                    else:
-                        # nada disponible ahora
-                        time.sleep(0.02)
-                except BlockingIOError:
-                    time.sleep(0.02)
-                except OSError:
-                    time.sleep(0.1)
-                except Exception:
-                    time.sleep(0.05)
+                    except OSError as e:
+                        self.log.debug("JS8Sender: error leyendo del socket: %s", e)
+                    self._connected = False
+                    break
+            except Exception as e:
+                self.log.debug("JS8Sender pump error: %s", e)
+            finally:
+                sel.close()
+                wake_r.close()
 
         self._pump_thread = threading.Thread(target=_pump, daemon=True)
         self._pump_thread.start()
 
     def close(self):
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        # llamar con self._lock tomado
         # parar pump
         try:
             self._pump_stop.set()
+            if self._pump_wake is not None:
+                self._pump_wake.send(b"\0")
             if self._pump_thread and self._pump_thread.is_alive():
                 self._pump_thread.join(timeout=0.5)
         except Exception:
             pass
         self._pump_thread = None
+        if self._pump_wake is not None:
+            try:
+                self._pump_wake.close()
+            except Exception:
+                pass
+            self._pump_wake = None
 
-        with self._lock:
-            if self._sock:
-                try:
-                    self._sock.close()
-                except Exception:
-                    pass
-            self._sock = None
-            self._connected = False
-            self._rx_buffer = b""
+        if self._sock:
+            try:
+                self._sock.close()
+            except Exception:
+                pass
+        self._sock = None
+        self._connected = False
+
+    # frames fijos: se serializan una sola vez
+    _FRAME_GET_CALLSIGN = json_dumps_line({"type": "STATION.GET_CALLSIGN"})
+    _FRAME_TX_SEND = json_dumps_line({"type": "TX.SEND"})
+    _SET_TEXT_END = b'"}\n'
 
     # bajo nivel
     def _send_raw(self, obj: Dict[str, Any]):
+        # payload y \n van en el mismo sendmsg: sin concatenar
+        self._send_raw_bytes(json_dumps_bytes(obj), b"\n")
+
+    def _send_raw_bytes(self, data: bytes, tail: bytes = b""):
         if not self._connected or not self._sock:
             raise RuntimeError("Socket no conectado")
-        data = (json.dumps(obj) + "\n").encode("utf-8")
+        if _HAS_SENDMSG:
+            bufs = [memoryview(b) for b in (data, tail) if b]
+            while bufs:
+                try:
+                    sent = self._sock.sendmsg(bufs, (), _MSG_NOSIGNAL)
+                except BlockingIOError:
+                    time.sleep(0.01)
+                    continue
+                if sent == 0:
+                    raise RuntimeError("socket sendmsg returned 0")
+                # descarta los buffers ya enviados y recorta el parcial
+                while sent and bufs:
+                    n = len(bufs[0])
+                    if sent >= n:
+                        sent -= n
+                        bufs.pop(0)
+                    else:
+                        bufs[0] = bufs[0][sent:]
+                        sent = 0
+            return
+        if tail:
+            data += tail
         # sendall puede lanzar BlockingIOError si el buffer está lleno; reintenta brevemente
         total = 0
         while total < len(data):
@@ -400,16 +621,20 @@ class JS8Sender:
         Enviamos y **no esperamos respuesta** (el hilo pump la drenará).
         Devolvemos {} siempre: evitamos bloquear y saturar.
         """
+        return self.request_frame(json_dumps_bytes(obj), b"\n")
+
+    def request_frame(self, data: bytes, tail: bytes = b"") -> Dict[str, Any]:
+        """Como request(), pero con el frame ya serializado (bytes terminados en \\n)."""
         try:
             with self._lock:
-                self._send_raw(obj)
+                self._send_raw_bytes(data, tail)
             return {}
         except Exception as e:
             # reconectar 1 vez
             self._reconnect_safely()
             try:
                 with self._lock:
-                    self._send_raw(obj)
+                    self._send_raw_bytes(data, tail)
                 return {}
             except Exception:
                 self.log.debug("request error: %s", e)
@@ -437,7 +662,7 @@ class JS8Sender:
         if (time.time() - self._last_seen) < 10.0:
             return True
         try:
-            self.request({"type": "STATION.GET_CALLSIGN"}, timeout=0.0)
+            self.request_frame(self._FRAME_GET_CALLSIGN)
             return True
         except Exception:
             return False
@@ -452,10 +677,14 @@ class JS8Sender:
         time.sleep(0.3)
         return True
 
-    def _send_with_retry(self, obj: Dict[str, Any], retries: int = 3) -> bool:
+    def _send_with_retry(self, obj, retries: int = 3) -> bool:
+        # obj: dict a serializar, o frame ya serializado (bytes)
         for i in range(retries):
             try:
-                self.request(obj, timeout=0.0)
+                if isinstance(obj, bytes):
+                    self.request_frame(obj)
+                else:
+                    self.request(obj, timeout=0.0)
                 return True
             except Exception:
                 self._reconnect_safely()
@@ -519,90 +748,85 @@ class JS8Sender:
 
             # 2) Fallback UI
             try:
-                base = text or ""
-                payload = base
-                if self._last_free_base is not None and base == self._last_free_base:
-                    z = self._zws_choices[self._zws_idx % len(self._zws_choices)]
-                    self._zws_idx += 1
-                    payload = base + z
-
-                try:
-                    self.set_text("")
-                except Exception:
-                    pass
-                time.sleep(self.clear_sleep)
-                self.set_text(payload)
-                time.sleep(self.ui_sleep)
-                if self._send_with_retry({"type": "TX.SEND"}):
-                    self.js8_wait_tx_cycle()
-                    try:
-                        self.set_text("")
-                    except Exception:
-                        pass
-                    self._last_free_base = base
+                if self._ui_send_free_once(text or ""):
                     return True
             except Exception as e:
                 self.log.warning("UI free send failed: %s", e)
 
             # 3) Reintento UI
-            base = text or ""
-            payload = base
-            if self._last_free_base is not None and base == self._last_free_base:
-                z = self._zws_choices[self._zws_idx % len(self._zws_choices)]
-                self._zws_idx += 1
-                payload = base + z
+            return self._ui_send_free_once(text or "")
+
+    def _ui_send_free_once(self, base: str) -> bool:
+        """SET_TEXT + TX.SEND; si se repite el último texto, lo cierra con un ZWS distinto (anti-dedupe)."""
+        tail = self._SET_TEXT_END
+        if self._last_free_base is not None and base == self._last_free_base:
+            tail = self._zws_tails[self._zws_idx % len(self._zws_tails)]
+            self._zws_idx += 1
+        try:
+            self.set_text("")
+        except Exception:
+            pass
+        time.sleep(self.clear_sleep)
+        # "value" es la última clave: se quita el '"}' final y el tail lo repone
+        # (UTF-8 crudo dentro de un string JSON es válido)
+        frame = json_dumps_bytes({"type": "TX.SET_TEXT", "value": base})
+        self.request_frame(frame[:-2], tail)
+        time.sleep(self.ui_sleep)
+        if self._send_with_retry(self._FRAME_TX_SEND):
+            self.js8_wait_tx_cycle()
             try:
                 self.set_text("")
             except Exception:
                 pass
-            time.sleep(self.clear_sleep)
-            self.set_text(payload)
-            time.sleep(self.ui_sleep)
-            if self._send_with_retry({"type": "TX.SEND"}):
-                self.js8_wait_tx_cycle()
-                try:
-                    self.set_text("")
-                except Exception:
-                    pass
-                self._last_free_base = base
-                return True
-
-            return False
+            self._last_free_base = base
+            return True
+        return False
 
     # util varias
     def heartbeat(self) -> Optional[str]:
         if not self._connected:
             self.connect()
         try:
-            self.request({"type": "STATION.GET_CALLSIGN"}, timeout=0.0)
+            self.request_frame(self._FRAME_GET_CALLSIGN)
             return None
         except Exception:
             return None
 
     def request_callsign(self) -> Optional[str]:
         try:
-            self.request({"type": "STATION.GET_CALLSIGN"}, timeout=0.0)
+            self.request_frame(self._FRAME_GET_CALLSIGN)
         except Exception:
             pass
         return None
 
     def start_heartbeat(self):
         def _hb():
-            while True:
+            while not self._hb_stop.wait(self.heartbeat_secs):
                 try:
                     ok = self.js8_is_alive()
                     if not ok:
                         self.log.warning("Heartbeat: JS8Call no responde.")
                 except Exception as e:
                     self.log.warning("Heartbeat error: %s", e)
-                time.sleep(self.heartbeat_secs)
         t = threading.Thread(target=_hb, daemon=True)
         t.start()
 
+    def stop_heartbeat(self):
+        self._hb_stop.set()
+
 
 # ───────────── Mesh wrapper ─────────────
 
+ROUTING_APP = "ROUTING_APP"
+# antigüedad mínima del índice shortName ↔ id antes de reconstruirlo por un fallo de búsqueda
+NODE_INDEX_MIN_AGE = 5.0
+
+
 class Mesh:
+    # __weakref__: pubsub guarda referencias débiles a los métodos suscritos
+    __slots__ = ("log", "_serial_path", "_hostport", "iface", "_orig_sendHeartbeat", "ack",
+                 "_sn_to_id", "_id_to_sn", "_index_at", "index_gen", "__weakref__")
+
     def __init__(self, serial_path: Optional[str], hostport: Optional[str], ack_timeout_sec: int, logger=None):
         self.log = logger or logging.getLogger("mesh")
         # ⬇️ guardar parámetros para poder recrear la interfaz
@@ -623,52 +847,74 @@ class Mesh:
             self.iface = MSerial()
 
         # ⬇️ parche mínimo: capturar errores del heartbeat y recrear la interfaz
-        self._orig_sendHeartbeat = getattr(self.iface, "sendHeartbeat", None)
-        if self._orig_sendHeartbeat:
-            def _safe_sendHeartbeat():
-                try:
-                    return self._orig_sendHeartbeat()
-                except (ConnectionResetError, OSError) as e:
-                    self.log.warning("Meshtastic heartbeat failed (%s). Recreating interface…", e)
-                    self._recreate_iface()
-                except Exception as e:
-                    # Evitar que muera el hilo programado de la librería
-                    self.log.warning("Meshtastic heartbeat exception: %s", e)
-            try:
-                self.iface.sendHeartbeat = _safe_sendHeartbeat
-            except Exception:
-                pass
+        self._install_hb_patch()
 
         self.ack = AckTracker(timeout_sec=ack_timeout_sec)
 
+        # Índices shortName ↔ node_id (claves en minúsculas), al día con NODEINFO
+        self._sn_to_id: Dict[str, str] = {}
+        self._id_to_sn: Dict[str, str] = {}
+        self._index_at = 0.0
+        # sube cada vez que cambia el índice: quien cachee IDs resueltos sabe cuándo rehacerlos
+        self.index_gen = 0
+        self._rebuild_node_index()
+        pub.subscribe(self._on_node_updated, "meshtastic.node.updated")
+
         def _rx_callback(packet=None, interface=None, topic=None, **kwargs):
             try:
-                dec = (packet or {}).get("decoded", {}) or {}
+                packet = packet or {}
+                dec = packet.get("decoded") or {}
                 txt = dec.get("text")
+                ack = dec.get("ack")
+                req_id = dec.get("requestId")
+                port = dec.get("portnum")
+                from_id = packet.get("fromId")
                 if txt:
-                    self.log.info("Mesh RX from %s → %r", packet.get("fromId"), txt)
+                    self.log.info("Mesh RX from %s → %r", from_id, txt)
 
-                if dec.get("ack", False):
-                    req_id = dec.get("requestId")
+                if ack:
                     info = self.ack.confirm(req_id)
                     if info:
-                        self.log.info("✅ ACK from %s for msg: %r", packet.get("fromId"), info['text'])
+                        self.log.info("✅ ACK from %s for msg: %r", from_id, info['text'])
                     return
 
-                port = dec.get("portnum")
+                if port != ROUTING_APP:
+                    return
                 routing = dec.get("routing") or {}
-                err = routing.get("errorReason")
-                req_id = dec.get("requestId") or routing.get("requestId")
-                if port == "ROUTING_APP" and err == "NONE" and req_id is not None:
+                if not req_id:
+                    req_id = routing.get("requestId")
+                if routing.get("errorReason") == "NONE" and req_id is not None:
                     info = self.ack.confirm(req_id)
-                    self.log.info("✅ ROUTING OK from %s (requestId=%s)%s",
-                                  packet.get("fromId"), req_id,
-                                  f" for msg: {info['text']!r}" if info else "")
+                    if info:
+                        self.log.info("✅ ROUTING OK from %s (requestId=%s) for msg: %r",
+                                      from_id, req_id, info['text'])
+                    else:
+                        self.log.info("✅ ROUTING OK from %s (requestId=%s)", from_id, req_id)
             except Exception as e:
                 self.log.debug("onReceive parsing error: %s", e)
 
         pub.subscribe(_rx_callback, "meshtastic.receive")
 
+    def _install_hb_patch(self):
+        """Envuelve iface.sendHeartbeat para que un fallo recree la interfaz en vez de matar el hilo."""
+        orig = self._orig_sendHeartbeat = getattr(self.iface, "sendHeartbeat", None)
+        if not orig:
+            return
+
+        def _safe_sendHeartbeat():
+            try:
+                return orig()
+            except (ConnectionResetError, OSError) as e:
+                self.log.warning("Meshtastic heartbeat failed (%s). Recreating interface…", e)
+                self._recreate_iface()
+            except Exception as e:
+                # Evitar que muera el hilo programado de la librería
+                self.log.warning("Meshtastic heartbeat exception: %s", e)
+        try:
+            self.iface.sendHeartbeat = _safe_sendHeartbeat
+        except Exception:
+            pass
+
     def _recreate_iface(self):
         """Cerrar y reabrir la interfaz Meshtastic y re-instalar el patch del heartbeat."""
         try:
@@ -686,21 +932,9 @@ class Mesh:
                 self.iface = create_tcp_interface(host, int(port or 4403))
 
             # re-instalar el patch del heartbeat
-            self._orig_sendHeartbeat = getattr(self.iface, "sendHeartbeat", None)
-            if self._orig_sendHeartbeat:
-                def _safe_sendHeartbeat():
-                    try:
-                        return self._orig_sendHeartbeat()
-                    except (ConnectionResetError, OSError) as e:
-                        self.log.warning("Meshtastic heartbeat failed (%s). Recreating interface…", e)
-                        self._recreate_iface()
-                    except Exception as e:
-                        self.log.warning("Meshtastic heartbeat exception: %s", e)
-                try:
-                    self.iface.sendHeartbeat = _safe_sendHeartbeat
-                except Exception:
-                    pass
+            self._install_hb_patch()
 
+            self._rebuild_node_index()
             self.log.info("Meshtastic interface recreated ✅")
         except Exception as e:
             self.log.error("Failed to recreate Meshtastic interface: %s", e)
@@ -712,19 +946,54 @@ class Mesh:
         except Exception as e:
             self.log.debug("error closing iface: %s", e)
 
+    def _rebuild_node_index(self):
+        sn_to_id: Dict[str, str] = {}
+        id_to_sn: Dict[str, str] = {}
+        try:
+            for node_id, n in list((self.iface.nodes or {}).items()):
+                sn = ((n or {}).get("user") or {}).get("shortName")
+                if sn:
+                    id_to_sn[str(node_id).lower()] = sn
+                    sn_to_id.setdefault(str(sn).lower(), node_id)  # gana el primero, como el escaneo
+        except Exception:
+            pass
+        self._sn_to_id, self._id_to_sn = sn_to_id, id_to_sn
+        self._index_at = time.monotonic()
+        self.index_gen += 1
+
+    def _maybe_rebuild_node_index(self) -> bool:
+        """Reindexa tras un fallo de búsqueda, como mucho una vez cada NODE_INDEX_MIN_AGE s."""
+        if time.monotonic() - self._index_at < NODE_INDEX_MIN_AGE:
+            return False
+        self._rebuild_node_index()
+        return True
+
+    def _on_node_updated(self, node=None, interface=None, **kwargs):
+        if interface is not None and interface is not self.iface:
+            return
+        user = (node or {}).get("user") or {}
+        node_id, sn = user.get("id"), user.get("shortName")
+        if node_id and sn:
+            self._id_to_sn[str(node_id).lower()] = sn
+            key = str(sn).lower()
+            if self._sn_to_id.get(key) != node_id:
+                self._sn_to_id[key] = node_id
+                self.index_gen += 1
+
+    def resolve_shortname_to_id(self, shortname: Optional[str]) -> Optional[str]:
+        if not shortname:
+            return None
+        sn = shortname.lower()
+        node_id = self._sn_to_id.get(sn)
+        if node_id is None and self._maybe_rebuild_node_index():
+            # nodo aún no indexado (sin evento de NODEINFO): reindexar y reintentar
+            node_id = self._sn_to_id.get(sn)
+        return node_id
+
     def resolve_dest_id(self, dest: Optional[str], shortname: Optional[str]) -> Optional[str]:
         if dest:
             return dest
-        if shortname:
-            sn = shortname.lower()
-            try:
-                for node_id, n in (self.iface.nodes or {}).items():
-                    info = n.get("user", {})
-                    if str(info.get("shortName", "")).lower() == sn:
-                        return node_id
-            except Exception:
-                pass
-        return None
+        return self.resolve_shortname_to_id(shortname)
 
     def resolve_channel_index(self, channel_index: Optional[int], channel_name: Optional[str]) -> Optional[int]:
         if channel_index is not None:
@@ -745,19 +1014,15 @@ class Mesh:
     def node_shortname(self, node_id: Optional[str]) -> Optional[str]:
         if not node_id:
             return None
-        try:
-            nodes = self.iface.nodes or {}
-            n = nodes.get(node_id)
-            if n and n.get("user"):
-                return n["user"].get("shortName")
-            lid = str(node_id).lower()
-            for k, v in nodes.items():
-                if str(k).lower() == lid:
-                    u = v.get("user") or {}
-                    return u.get("shortName")
-        except Exception:
-            pass
-        return None
+        # los fromId de Meshtastic ya vienen en minúsculas ("!abcd1234"): se prueba tal cual
+        sn = self._id_to_sn.get(node_id)
+        if sn is not None:
+            return sn
+        lid = str(node_id).lower()
+        sn = self._id_to_sn.get(lid)
+        if sn is None and self._maybe_rebuild_node_index():
+            sn = self._id_to_sn.get(lid)
+        return sn
 
     def send_text(self, text: str, destination_id: Optional[str] = None,
                   channel_index: Optional[int] = None, want_ack: bool = False):
@@ -777,7 +1042,7 @@ class Mesh:
             msg_id = self.iface.sendText(text, **kwargs)
         except Exception as e:
             self.log.error("Failed sending to Meshtastic: %s", e)
-            return
+            return False
 
         if isinstance(msg_id, dict):
             request_id = msg_id.get("id") or msg_id.get("requestId") or msg_id.get("payloadId")
@@ -789,11 +1054,61 @@ class Mesh:
                 self.ack.add(int(request_id), text)
             except Exception:
                 pass
+        return True
 
 
 # ───────────── Extractor de texto JS8 ─────────────
 
+if msgspec is not None:
+    class JS8Params(msgspec.Struct):
+        FROM: Optional[str] = None
+        from_: Optional[str] = msgspec.field(default=None, name="from")
+        TO: Optional[str] = None
+        to_: Optional[str] = msgspec.field(default=None, name="to")
+        TEXT: Optional[str] = None
+        text_: Optional[str] = msgspec.field(default=None, name="text")
+
+    class JS8Event(msgspec.Struct):
+        """Solo los campos que usa el puente; el resto del frame no se materializa."""
+        type: Optional[str] = None
+        event: Optional[str] = None
+        FROM: Optional[str] = None
+        from_: Optional[str] = msgspec.field(default=None, name="from")
+        TO: Optional[str] = None
+        to_: Optional[str] = msgspec.field(default=None, name="to")
+        TEXT: Optional[str] = None
+        text_: Optional[str] = msgspec.field(default=None, name="text")
+        params: Optional[JS8Params] = None
+        value: Any = None
+
+    JS8_EVENT_DECODER = msgspec.json.Decoder(JS8Event)
+else:
+    JS8Event = None
+    JS8_EVENT_DECODER = None
+
+
+def _extract_js8_struct(evt) -> Optional[Tuple[str, str, str]]:
+    if (evt.type or evt.event or "").upper().startswith("RX"):
+        txt = normalize_text(evt.TEXT or evt.text_ or "")
+        if txt:
+            return evt.FROM or evt.from_ or "UNKNOWN", evt.TO or evt.to_ or "", txt
+    p = evt.params
+    if p is None:
+        # sin params: como en la vía dict, probamos 'value' si es un objeto
+        if isinstance(evt.value, dict):
+            return extract_js8_text({"type": evt.type, "params": evt.value})
+        return None
+    if (evt.type or "").upper().startswith("RX"):
+        txt = normalize_text(p.TEXT or p.text_ or "")
+        if txt:
+            return p.FROM or p.from_ or "UNKNOWN", p.TO or p.to_ or "", txt
+    return None
+
+
 def extract_js8_text(js8_evt: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+    if JS8Event is not None and isinstance(js8_evt, JS8Event):
+        return _extract_js8_struct(js8_evt)
+
     def get_fields(c: Dict[str, Any]):
         frm = c.get("FROM") or c.get("from") or "UNKNOWN"
         to = c.get("TO") or c.get("to") or ""
@@ -817,8 +1132,12 @@ def extract_js8_text(js8_evt: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
 
 # ───────────── Matching NodeId/ShortName ─────────────
 
+_HEXCHARS = frozenset("0123456789abcdefABCDEF")
+
+
 def _looks_like_suffix(token: str) -> bool:
-    return bool(re.fullmatch(r"[A-Fa-f0-9]{3,}", token))
+    # equivale a re.fullmatch(r"[A-Fa-f0-9]{3,}", token), sin pasar por re
+    return len(token) >= 3 and _HEXCHARS.issuperset(token)
 
 
 def matches_sender(token: str, from_id: str, mesh: Mesh) -> bool:
@@ -844,15 +1163,18 @@ def matches_sender(token: str, from_id: str, mesh: Mesh) -> bool:
 AT_CALL_RE = re.compile(r"^@([A-Za-z0-9/]+)\s*(.*)$")
 
 
-def split_at_call(msg: str):
+def split_at_call(msg: str, stripped: bool = False):
+    """stripped=True: el llamador garantiza msg sin espacios en los extremos (no se vuelve a limpiar)."""
     if not isinstance(msg, str):
         return None, None, msg
-    m = AT_CALL_RE.match(msg.strip())
+    m = AT_CALL_RE.match(msg if stripped else msg.strip())
     if not m:
         return None, None, msg
     tocall_raw = m.group(1)
     tocall_upper = tocall_raw.upper()
-    body = (m.group(2) or "").strip()
+    body = m.group(2)
+    if not stripped:
+        body = body.strip()
     return tocall_raw, tocall_upper, body
 
 
@@ -871,17 +1193,36 @@ class MeshToJS8:
         self.mesh = mesh
         self.js8 = js8_sender
         self.to = to or "@ALLCALL"
+        # destino por defecto resuelto una vez: FREE (@ALLCALL) o indicativo para dirigido
+        dest = self.to.strip()
+        self._dest_call = (dest[1:] if dest.startswith("@") else dest).upper()
+        self._is_free = not self._dest_call or self._dest_call == "ALLCALL"
         self.prefix = prefix or ""
         self.maxlen = maxlen
         self.allow_self = allow_self
         self.only_from_raw = [x.strip() for x in (only_from or []) if x and x.strip()]
+        # tokens de --m2j-only-from clasificados una vez (como matches_sender), en minúsculas:
+        # !id exacto, sufijo hex del id, o shortName
+        self._filter_ids = set()
+        self._filter_hex = set()
+        self._filter_shorts = set()
+        for tok in self.only_from_raw:
+            if tok.startswith("!"):
+                self._filter_ids.add(tok.lower())
+            elif _looks_like_suffix(tok):
+                self._filter_hex.add(tok.lower())
+            else:
+                self._filter_shorts.add(tok.lower())
+        self._filter_hex_lens = sorted({len(t) for t in self._filter_hex})
         self.j2m_prefix_to_ignore = (j2m_prefix_to_ignore or "").strip()
         self.escape_at = bool(escape_at)
         self.log = logger or logging.getLogger("m2j")
 
-        # Anti-eco simple: recuerda últimos (from_id, txt) para evitar duplicados inmediatos.
+        # Anti-eco simple: recuerda la huella (8 bytes) de los últimos (from_id, txt)
+        # para evitar duplicados inmediatos.
         # Pon _recent_max = 0 si NO quieres este filtro.
-        self._recent: List[Tuple[str, str]] = []
+        # OrderedDict: pertenencia O(1) y expulsión del más antiguo con popitem(last=False)
+        self._recent: "OrderedDict[bytes, None]" = OrderedDict()
         self._recent_max = 20  # tamaño de ventana
 
         self.my_id = None
@@ -900,40 +1241,49 @@ class MeshToJS8:
             return True
         if not from_id:
             return False
-        for tok in self.only_from_raw:
-            if matches_sender(tok, from_id, self.mesh):
+        fid = from_id.strip().lower()
+        if fid:
+            if fid in self._filter_ids:
+                return True
+            for n in self._filter_hex_lens:
+                if fid[-n:] in self._filter_hex:
+                    return True
+        if self._filter_shorts:
+            short = self.mesh.node_shortname(from_id)
+            if short is None:
+                if self.log.isEnabledFor(logging.DEBUG):
+                    self.log.debug("No shortName yet for %s when matching %r", from_id, sorted(self._filter_shorts))
+            elif short.lower() in self._filter_shorts:
                 return True
         self.log.debug("Filtered out %s by --m2j-only-from %r", from_id, self.only_from_raw)
         return False
 
     def _truncate(self, s: str) -> str:
-        if self.maxlen and len(s) > self.maxlen:
-            return s[: self.maxlen - 1] + "…"
-        return s
+        maxlen = self.maxlen
+        if not maxlen or len(s) <= maxlen:
+            return s
+        return s[: maxlen - 1] + "…"
 
     def _send_free_or_default_dest(self, rendered_text: str):
-        dest = (self.to or "").strip()
-        up = dest.upper()
-        if up in {"@ALLCALL", "ALLCALL"}:
+        if self._is_free:
             ok = self.js8.send_free(rendered_text)
             self.log.info("→ JS8 (free) [%d c] ok=%s", len(rendered_text), ok)
         else:
-            if dest.startswith("@"):
-                dest = dest[1:]
-            ok = self.js8.send_directed(dest.upper(), rendered_text)
-            self.log.info("→ JS8 (direct to %s) [%d c] ok=%s", dest.upper(), len(rendered_text), ok)
+            dest = self._dest_call
+            ok = self.js8.send_directed(dest, rendered_text)
+            self.log.info("→ JS8 (direct to %s) [%d c] ok=%s", dest, len(rendered_text), ok)
 
-    def _recent_push(self, from_id: str, txt: str) -> bool:
-        """Devuelve True si (from_id, txt) ya fue procesado recientemente (dup)."""
+    def _recent_push(self, sig: bytes) -> bool:
+        """Devuelve True si la huella sig ya fue procesada recientemente (dup)."""
         if self._recent_max <= 0:
             return False
-        sig = (from_id or "", txt or "")
-        if sig in self._recent:
+        recent = self._recent
+        if sig in recent:
             return True
-        self._recent.append(sig)
-        if len(self._recent) > self._recent_max:
+        recent[sig] = None
+        if len(recent) > self._recent_max:
             # elimina por el principio (FIFO)
-            self._recent = self._recent[-self._recent_max:]
+            recent.popitem(last=False)
         return False
 
     def on_receive_text(self, packet=None, interface=None, topic=None, **kwargs):
@@ -964,34 +1314,35 @@ class MeshToJS8:
                 return
 
             # Anti-dup inmediato por (origen, texto) — evita dobles envíos si la lib publica dos veces
-            if self._recent_push(from_id, txt):
+            sig = hashlib.blake2b(from_id.encode("utf-8") + b"\0" + txt.encode("utf-8"),
+                                  digest_size=8, person=b"m2j-dup").digest()
+            if self._recent_push(sig):
                 self.log.debug("Duplicate (from_id,txt) ignored: %s | %r", from_id, txt)
                 return
 
-            stripped = txt.lstrip()
-
-            # 1) Caso especial @@ → literal FREE (como el script que te funciona)
-            if self.escape_at and stripped.startswith('@@'):
-                txt_literal = re.sub(r'^(\s*)@@', r'\1@', txt, count=1)
-                txt_literal = self._truncate(txt_literal)
-                ok = self.js8.send_free(txt_literal)
-                self.log.info("➡️  %s -> JS8 (FREE literal from @@) [%d c] ok=%s | text=%r",
-                              from_id, len(txt_literal), ok, txt_literal)
-                return
+            # txt ya viene sin espacios en los extremos (normalize_text).
+            # Solo los textos que empiezan por '@' pueden ser @@ o @CALL: el resto no pasa por regex
+            if txt[:1] == "@":
+                # 1) Caso especial @@ → literal FREE (como el script que te funciona)
+                if self.escape_at and txt.startswith('@@'):
+                    # quita una de las dos @
+                    txt_literal = self._truncate(txt[1:])
+                    ok = self.js8.send_free(txt_literal)
+                    self.log.info("➡️  %s -> JS8 (FREE literal from @@) [%d c] ok=%s | text=%r",
+                                  from_id, len(txt_literal), ok, txt_literal)
+                    return
 
-            # 2) Caso @CALL MENSAJE → dirigido EXACTO (como tu primer script)
-            tocall_raw, tocall_upper, body = split_at_call(txt)
-            if tocall_upper:
-                body_out = (body or "").strip()
-                if self.maxlen and len(body_out) > self.maxlen:
-                    body_out = body_out[: self.maxlen - 1] + "…"
-                ok = self.js8.send_directed(tocall_upper, body_out)
-                if ok:
-                    self.log.info("➡️  %s -> JS8 (direct to %s) body=[%d c] ok=True",
-                                  from_id, tocall_upper, len(body_out))
-                else:
-                    self.log.warning("Fallo al enviar a JS8 (direct to %s) body=%r", tocall_upper, body_out)
-                return
+                # 2) Caso @CALL MENSAJE → dirigido EXACTO (como tu primer script)
+                tocall_raw, tocall_upper, body_out = split_at_call(txt, stripped=True)
+                if tocall_upper:
+                    body_out = self._truncate(body_out)
+                    ok = self.js8.send_directed(tocall_upper, body_out)
+                    if ok:
+                        self.log.info("➡️  %s -> JS8 (direct to %s) body=[%d c] ok=True",
+                                      from_id, tocall_upper, len(body_out))
+                    else:
+                        self.log.warning("Fallo al enviar a JS8 (direct to %s) body=%r", tocall_upper, body_out)
+                    return
 
             # 3) No dirigido → FREE/dirigido según --m2j-to
             short = self.mesh.node_shortname(from_id)
@@ -1014,15 +1365,6 @@ class MeshToJS8:
 
 # ───────────── JS8 → Meshtastic ─────────────
 
-def _find_at_anywhere(text: str) -> Optional[Tuple[str, str]]:
-    m = AT_RE_LOOSE.search(text.strip())
-    if not m:
-        return None
-    tag = m.group("tag")
-    body = (m.group("body") or "").strip()
-    return tag, body
-
-
 class JS8ToMesh:
     def __init__(self, mesh: Mesh, prefix: str, strip_tag: bool,
                  only_tag: Optional[str], chan_routes: Dict[str, List[str]],
@@ -1035,11 +1377,50 @@ class JS8ToMesh:
         self.only_tag = (only_tag or "").lower() if only_tag else None
         self.chan_routes = chan_routes
         self.node_routes = node_routes
+        # sin ninguna ruta configurada todo va al destino por defecto
+        self._have_any_routes = bool(chan_routes or node_routes)
         self.default_dest_id = default_dest_id
         self.default_chan_idx = default_chan_idx
         self.want_ack = want_ack
         self.log = logger or logging.getLogger("j2m")
 
+        # Planes por tag: [ruta, destino|None]. Lo que aún no se puede resolver (nodo
+        # sin NODEINFO, canales sin cargar) se reintenta al usarse; todo se vuelve a
+        # resolver si cambia el índice de nodos o si un envío falla.
+        self._plan_gen = mesh.index_gen
+        self._node_plan: Dict[str, List[list]] = {}
+        for tag_l, dests in (node_routes or {}).items():
+            plan = self._node_plan[tag_l] = []
+            for dest in dests:
+                if not dest:
+                    continue
+                dest_id = self.resolve_dest_id_compat(dest)
+                if not dest_id:
+                    self.log.warning("No node found yet for route-node %r (tag=%s)", dest, tag_l)
+                plan.append([dest, dest_id])
+        self._chan_plan: Dict[str, List[list]] = {}
+        for tag_l, chans in (chan_routes or {}).items():
+            plan = self._chan_plan[tag_l] = []
+            for ch in chans:
+                ch_idx = self._resolve_chan(ch)
+                if ch_idx is None:
+                    self.log.warning("Unknown channel yet for route-chan %r (tag=%s)", ch, tag_l)
+                plan.append([ch, ch_idx])
+
+    def _refresh_plans(self):
+        self._plan_gen = self.mesh.index_gen
+        for plan in self._node_plan.values():
+            for entry in plan:
+                entry[1] = self.resolve_dest_id_compat(entry[0])
+        for plan in self._chan_plan.values():
+            for entry in plan:
+                entry[1] = self._resolve_chan(entry[0])
+
+    def _resolve_chan(self, ch: str) -> Optional[int]:
+        if ch.isdigit():
+            return int(ch)
+        return self.mesh.resolve_channel_index(None, ch)
+
     def handle_js8_event(self, evt: Dict[str, Any]):
         extracted = extract_js8_text(evt)
         if not extracted:
@@ -1053,58 +1434,66 @@ class JS8ToMesh:
 
         text_for_tag = strip_leading_callsign(text)
 
-        m = AT_RE_STRICT.match(text_for_tag)
-        if m:
-            tag = m.group("tag")
-            body = (m.group("body") or "").strip()
-        else:
-            found = _find_at_anywhere(text_for_tag)
-            if not found:
-                self.log.debug("No @TAG found in JS8 text after strip: %r", text_for_tag)
-                if self.only_tag:
-                    return
-                return
-            tag, body = found
+        # una sola búsqueda: la primera @TAG, esté al inicio o en medio del texto
+        m = AT_RE_LOOSE.search(text_for_tag)
+        if not m:
+            self.log.debug("No @TAG found in JS8 text after strip: %r", text_for_tag)
+            return
+        tag = m.group("tag")
+        body = (m.group("body") or "").strip()
 
         tag_l = (tag or "").lower()
 
+        use_default = not self._have_any_routes
+        if use_default:
+            if self.only_tag and tag_l != self.only_tag:
+                return
+            node_plan = chan_plan = None
+        else:
+            if self._plan_gen != self.mesh.index_gen:
+                self._refresh_plans()
+            node_plan = self._node_plan.get(tag_l)
+            chan_plan = self._chan_plan.get(tag_l)
+            if not node_plan and not chan_plan:
+                self.log.info("No route matched for tag '@%s' (ignored).", tag)
+                return
+
+        # el mensaje se compone una vez, y solo si hay a dónde mandarlo
         if self.strip_tag:
             out_text = body
+        elif body:
+            out_text = "@" + tag + " " + body
         else:
-            out_text = f"@{tag}" + (f" {body}" if body else "")
+            out_text = "@" + tag
         final_msg = f"{self.prefix} {frm}: {out_text}".strip()
 
+        if use_default:
+            self.mesh.send_text(final_msg, destination_id=self.default_dest_id,
+                                channel_index=self.default_chan_idx, want_ack=self.want_ack)
+            return
+
         sent_any = False
 
-        for dest in self.node_routes.get(tag_l, []):
-            if not dest:
-                continue
-            if dest.startswith("!"):
-                dest_id = dest
-            else:
-                dest_id = self.resolve_dest_id_compat(dest)
-            if not dest_id:
-                self.log.warning("No node found for route-node %r (tag=%s)", dest, tag)
-                continue
-            self.mesh.send_text(final_msg, destination_id=dest_id, channel_index=None, want_ack=self.want_ack)
+        for entry in node_plan or ():
+            dest_id = entry[1]
+            if dest_id is None:
+                dest_id = entry[1] = self.resolve_dest_id_compat(entry[0])
+                if not dest_id:
+                    self.log.warning("No node found for route-node %r (tag=%s)", entry[0], tag)
+                    continue
+            if not self.mesh.send_text(final_msg, destination_id=dest_id, channel_index=None, want_ack=self.want_ack):
+                entry[1] = None  # se vuelve a resolver en el próximo mensaje
             sent_any = True
 
-        for ch in self.chan_routes.get(tag_l, []):
-            if ch.isdigit():
-                ch_idx = int(ch)
-            else:
-                ch_idx = self.mesh.resolve_channel_index(None, ch)
+        for entry in chan_plan or ():
+            ch_idx = entry[1]
             if ch_idx is None:
-                self.log.warning("Unknown channel for route-chan %r (tag=%s)", ch, tag)
-                continue
-            self.mesh.send_text(final_msg, destination_id=None, channel_index=ch_idx, want_ack=False)
-            sent_any = True
-
-        if not self.chan_routes and not self.node_routes:
-            if self.only_tag and tag_l != self.only_tag:
-                return
-            self.mesh.send_text(final_msg, destination_id=self.default_dest_id,
-                                channel_index=self.default_chan_idx, want_ack=self.want_ack)
+                ch_idx = entry[1] = self._resolve_chan(entry[0])
+                if ch_idx is None:
+                    self.log.warning("Unknown channel for route-chan %r (tag=%s)", entry[0], tag)
+                    continue
+            if not self.mesh.send_text(final_msg, destination_id=None, channel_index=ch_idx, want_ack=False):
+                entry[1] = None
             sent_any = True
 
         if not sent_any:
@@ -1115,14 +1504,9 @@ class JS8ToMesh:
         if short_or_id.startswith("!"):
             return short_or_id
         try:
-            sn = short_or_id.lower()
-            for node_id, n in (self.mesh.iface.nodes or {}).items():
-                info = n.get("user", {})
-                if str(info.get("shortName", "")).lower() == sn:
-                    return node_id
+            return self.mesh.resolve_shortname_to_id(short_or_id)
         except Exception:
-            pass
-        return None
+            return None
 
 
 # ───────────── Main ─────────────
@@ -1198,10 +1582,9 @@ def main():
         default_chan_idx = mesh.resolve_channel_index(args.channel_index, args.channel_name)
 
         def ack_watchdog(mesh_obj: Mesh):
+            # duerme hasta el próximo vencimiento posible (o indefinidamente sin ACKs pendientes)
             while True:
-                time.sleep(1.0)
-                expired = mesh_obj.ack.sweep_timeouts()
-                for rid, info in expired:
+                for rid, info in mesh_obj.ack.wait_expired():
                     logging.getLogger("mesh").warning("⏱️  ACK timeout (>%ss) for requestId=%s, msg=%r",
                                                       mesh_obj.ack.timeout, rid, info['text'])
 
@@ -1252,11 +1635,22 @@ def main():
                  enable_j2m, enable_m2j,
                  args.meshtastic_host or args.meshtastic_serial or "auto-serial")
 
-        while True:
-            time.sleep(0.5)
+        # Sin sondeo: el hilo principal duerme hasta SIGINT/SIGTERM.
+        # SIGINT conserva su KeyboardInterrupt por defecto y SIGTERM se traduce a lo
+        # mismo; el manejador no toca locks (nada de Event.set() desde una señal).
+        def _on_sigterm(signum, frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, _on_sigterm)
+        if hasattr(signal, "pause"):
+            while True:
+                signal.pause()
+        else:
+            # Windows: sin signal.pause(); Ctrl+C interrumpe el sleep
+            while True:
+                time.sleep(1.0)
 
     except KeyboardInterrupt:
-        LOG.info("CTRL+C: shutting down…")
+        LOG.info("CTRL+C/SIGTERM: shutting down…")
     finally:
         if js8_listener:
             logging.getLogger("js8.listener").info("Stopping JS8 listener…")
@@ -0,0 +1,178 @@
+import os
+import selectors
+import socket
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import js8tastic  # noqa: E402
+from pubsub import pub  # noqa: E402
+
+
+class FakeIface:
+    """Interfaz Meshtastic mínima: nodos en memoria y envíos registrados."""
+
+    def __init__(self, **kwargs):
+        self.nodes = {"!1111": {"user": {"id": "!1111", "shortName": "ABC"}}}
+        self.sent = []
+        self.fail = False
+
+    def sendText(self, text, **kwargs):
+        if self.fail:
+            raise OSError("radio gone")
+        self.sent.append((text, kwargs))
+        return len(self.sent)
+
+    def getChannelList(self):
+        return []
+
+    def close(self):
+        pass
+
+
+def rx_event(text):
+    return {"type": "RX.DIRECTED", "params": {"FROM": "EA1XYZ", "TO": "EA2ABC", "TEXT": text}}
+
+
+class MeshRouteTest(unittest.TestCase):
+    def setUp(self):
+        self._orig_mtcp = js8tastic.MTCP
+        js8tastic.MTCP = FakeIface
+        self.mesh = js8tastic.Mesh(None, "127.0.0.1:4403", ack_timeout_sec=30)
+        self.iface = self.mesh.iface
+        self.router = js8tastic.JS8ToMesh(
+            self.mesh, prefix="[JS8]", strip_tag=False, only_tag=None,
+            chan_routes={}, node_routes={"net": ["abc"]},
+            default_dest_id=None, default_chan_idx=None, want_ack=False)
+
+    def tearDown(self):
+        js8tastic.MTCP = self._orig_mtcp
+        pub.unsubAll()
+
+    def dests(self):
+        return [kw.get("destinationId") for _, kw in self.iface.sent]
+
+    def test_route_follows_node_update(self):
+        self.router.handle_js8_event(rx_event("@NET hola"))
+        node = {"user": {"id": "!2222", "shortName": "ABC"}}
+        pub.sendMessage("meshtastic.node.updated", node=node, interface=self.iface)
+        self.router.handle_js8_event(rx_event("@NET otra"))
+        self.assertEqual(self.dests(), ["!1111", "!2222"])
+
+    def test_failed_send_clears_cached_target(self):
+        self.iface.fail = True
+        self.router.handle_js8_event(rx_event("@NET hola"))
+        # el índice cambia sin evento NODEINFO: solo el fallo fuerza la nueva resolución
+        self.mesh._sn_to_id["abc"] = "!3333"
+        self.iface.fail = False
+        self.router.handle_js8_event(rx_event("@NET otra"))
+        self.assertEqual(self.dests(), ["!3333"])
+
+
+class ListenerParseTest(unittest.TestCase):
+    """Líneas crudas por _try_parse_and_handle, con msgspec y solo con json stdlib."""
+
+    def setUp(self):
+        self.listener = js8tastic.JS8Listener("tcp", "127.0.0.1", 2442, buffer_size=1024)
+        self.decoders = [("msgspec", self.listener._decoder), ("stdlib", None)]
+
+    def feed(self, line):
+        got = []
+        self.listener._try_parse_and_handle(line, got.append)
+        return got
+
+    def test_valid_frame(self):
+        line = b'{"type":"RX.DIRECTED","params":{"FROM":"EA1XYZ","TO":"EA2ABC","TEXT":"@NET hola"}}\r'
+        for name, decoder in self.decoders:
+            with self.subTest(decoder=name):
+                self.listener._decoder = decoder
+                got = self.feed(line)
+                self.assertEqual(len(got), 1)
+                self.assertEqual(js8tastic.extract_js8_text(got[0]), ("EA1XYZ", "EA2ABC", "@NET hola"))
+
+    def test_non_utf8_frame(self):
+        line = b'{"type":"RX.DIRECTED","params":{"FROM":"EA1XYZ","TEXT":"hola\xff\xfe"}}'
+        for name, decoder in self.decoders:
+            with self.subTest(decoder=name):
+                self.listener._decoder = decoder
+                got = self.feed(line)
+                self.assertEqual(len(got), 1)
+                self.assertEqual(js8tastic.extract_js8_text(got[0]), ("EA1XYZ", "", "hola"))
+
+    def test_schema_mismatch_falls_back_to_dict(self):
+        line = b'{"type":"RX.ACTIVITY","params":["no", "es", "un", "objeto"],"TEXT":5}'
+        expected = {"type": "RX.ACTIVITY", "params": ["no", "es", "un", "objeto"], "TEXT": 5}
+        for name, decoder in self.decoders:
+            with self.subTest(decoder=name):
+                self.listener._decoder = decoder
+                got = self.feed(line)
+                self.assertEqual(len(got), 1)
+                self.assertEqual(got[0], expected)
+
+    def test_non_object_lines_are_ignored(self):
+        lines = [b"", b"\r", b"   ", b"[1, 2]", b"42", b'"texto"', b"null", b"keepalive",
+                 b'{"type":', b"{no es json}"]
+        for name, decoder in self.decoders:
+            for line in lines:
+                with self.subTest(decoder=name, line=line):
+                    self.listener._decoder = decoder
+                    self.assertEqual(self.feed(line), [])
+
+
+class SenderPumpTest(unittest.TestCase):
+    """El pump del JS8Sender solo despierta con datos o al cerrar (sin select con timeout)."""
+
+    def setUp(self):
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.selects = []
+        real_selector = selectors.DefaultSelector
+        selects = self.selects
+
+        class CountingSelector(real_selector):
+            def select(self, timeout=None):
+                selects.append(timeout)
+                return super().select(timeout)
+
+        self._patch = mock.patch.object(js8tastic.selectors, "DefaultSelector", CountingSelector)
+        self._patch.start()
+        self.sender = js8tastic.JS8Sender("127.0.0.1", self.server.getsockname()[1])
+        self.sender.connect()
+        self.peer, _ = self.server.accept()
+
+    def tearDown(self):
+        self.sender.close()
+        self._patch.stop()
+        self.peer.close()
+        self.server.close()
+
+    def test_idle_pump_blocks_without_timeout(self):
+        time.sleep(0.6)
+        self.assertEqual(self.selects, [None])
+        self.peer.sendall(b'{"type":"STATION.CALLSIGN","value":"EA1XYZ"}\n')
+        deadline = time.monotonic() + 2.0
+        while len(self.selects) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.selects, [None, None])
+        self.assertTrue(self.sender._connected)
+
+    def test_close_wakes_pump(self):
+        thread = self.sender._pump_thread
+        started = time.monotonic()
+        self.sender.close()
+        self.assertFalse(thread.is_alive())
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertIsNone(self.sender._pump_wake)
+
+    def test_peer_close_marks_disconnected(self):
+        self.peer.close()
+        self.sender._pump_thread.join(timeout=2.0)
+        self.assertFalse(self.sender._connected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,11 @@
 # 31/08/25 v.1.0
 
 import socket
+import select
 import json
 import time
 import argparse
+import signal
 import logging, sys
 from datetime import datetime
 
@@ -16,15 +18,13 @@ logging.basicConfig(
 
 log = logging.getLogger("js8-snr")
 
-def send_js8(text, host="127.0.0.1", port=2442, transport="TCP", timeout=10):
-    """Sends a text to JS8Call using TX.SEND_MESSAGE. Return True/False."""
-    pkt = {
-        "type": "TX.SEND_MESSAGE",
-        "value": text,
-        "params": {"_ID": str(int(time.time() * 1000))}
-    }
-    data = (json.dumps(pkt) + "\n").encode("utf-8")
+def send_message_frame(text):
+    """Pre-encoded TX.SEND_MESSAGE frame split around the _ID value: (head, tail)."""
+    head = ('{"type":"TX.SEND_MESSAGE","value":' + json.dumps(text) + ',"params":{"_ID":"').encode("utf-8")
+    return head, b'"}}\n'
 
+def send_js8_bytes(data, host="127.0.0.1", port=2442, transport="TCP", timeout=10):
+    """Sends an already encoded JSON frame (ending in \\n) to JS8Call. Return True/False."""
     if transport.upper() == "UDP":
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.settimeout(timeout)
@@ -36,20 +36,47 @@ def send_js8(text, host="127.0.0.1", port=2442, transport="TCP", timeout=10):
         finally:
             s.close()
     else:  # TCP by default
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(timeout)
+        return _send_tcp(data, host, port, timeout)
+
+# Persistent TCP connection to JS8Call, reused across beacons
+_tcp = None
+
+def _close_tcp():
+    global _tcp
+    if _tcp is not None:
         try:
-            s.connect((host, port))
-            s.sendall(data)
-            return True
+            _tcp.shutdown(socket.SHUT_RDWR)
         except Exception:
+            pass
+        _tcp.close()
+        _tcp = None
+
+def _tcp_alive(s):
+    """Discards pending JS8Call replies. Returns False if JS8Call closed the connection."""
+    while select.select([s], [], [], 0)[0]:
+        try:
+            if not s.recv(4096):
+                return False
+        except OSError:
             return False
-        finally:
-            try:
-                s.shutdown(socket.SHUT_RDWR)
-            except Exception:
-                pass
-            s.close()
+    return True
+
+def _send_tcp(data, host, port, timeout):
+    global _tcp
+    for _ in range(2):  # on failure reconnect once and retry
+        try:
+            if _tcp is not None and not _tcp_alive(_tcp):
+                _close_tcp()
+            if _tcp is None:
+                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                s.settimeout(timeout)
+                s.connect((host, port))
+                _tcp = s
+            _tcp.sendall(data)
+            return True
+        except Exception:
+            _close_tcp()
+    return False
 
 def main():
     ap = argparse.ArgumentParser(description="Sends SNR? periodically to a JS8Call Group")
@@ -66,9 +93,13 @@ def main():
     log.info(f"Sending '{group_tag} SNR?' now and each {args.minutes} min "
           f"via {args.transport} - {args.host}:{args.port}")
 
+    msg = f"{group_tag} SNR?"
+    # Only _ID changes between beacons: encode the rest once
+    frame_head, frame_tail = send_message_frame(msg)
+
     def tx_once():
-        msg = f"{group_tag} SNR?"
-        ok = send_js8(msg, host=args.host, port=args.port, transport=args.transport)
+        data = frame_head + str(int(time.time() * 1000)).encode() + frame_tail
+        ok = send_js8_bytes(data, host=args.host, port=args.port, transport=args.transport)
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
       
         if ok:
@@ -77,6 +108,13 @@ def main():
             log.error("ERROR. Impossible to send.")
         return ok
 
+    # Ctrl-C keeps its default KeyboardInterrupt; systemctl stop (SIGTERM) is
+    # turned into the same exception, which also cuts the sleep below short
+    def _on_sigterm(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _on_sigterm)
+
     try:
         # 1) Initial send
         tx_once()
@@ -84,13 +122,14 @@ def main():
         # 2) Stable programming: each exact interval, without derive
         next_fire = time.monotonic() + interval
         while True:
-            sleep_s = max(0.0, next_fire - time.monotonic())
-            time.sleep(sleep_s)
+            time.sleep(max(0.0, next_fire - time.monotonic()))
             tx_once()
             next_fire += interval
 
     except KeyboardInterrupt:
         log.error("\nStop by the user. 73!")
+    finally:
+        _close_tcp()
 
 if __name__ == "__main__":
     main()
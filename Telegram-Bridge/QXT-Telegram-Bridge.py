@@ -25,16 +25,29 @@ import logging
 import re
 import config
 import math
+import sys
+import heapq
 
-from i18n import t
+from i18n import t, template
 from dataclasses import dataclass, field
 from typing import Optional, Dict, List, Tuple
-from collections import deque
+from collections import OrderedDict, deque
 from httpx import Limits
 
+# orjson (opcional): parsea bytes directamente, sin decode previo
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+# h2 (opcional): si está instalado, la API de Telegram va por HTTP/2 (varias peticiones en una conexión)
+try:
+    import h2
+except Exception:
+    h2 = None
 
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
+from telegram.ext import Application, ApplicationHandlerStop, CommandHandler, ContextTypes, MessageHandler, TypeHandler, filters
 from telegram.request import HTTPXRequest
 from telegram.error import NetworkError, TimedOut, RetryAfter
 
@@ -112,7 +125,7 @@ def _to_int_safe(x):
             return None
 
 
-def update_heard_from_params_calls_map(params: dict) -> int:
+def update_heard_from_params_calls_map(params: dict, now: Optional[float] = None) -> int:
     """
     Soporta el formato:
     evt = {
@@ -130,6 +143,8 @@ def update_heard_from_params_calls_map(params: dict) -> int:
     if not isinstance(params, dict):
         return 0
 
+    if now is None:
+        now = time.time()
     count = 0
     for cs_key, info in params.items():
         if not isinstance(cs_key, str):
@@ -157,19 +172,18 @@ def update_heard_from_params_calls_map(params: dict) -> int:
         if isinstance(utc_ms, (int, float)):
             utc_ts = (utc_ms / 1000.0) if utc_ms > 1e12 else float(utc_ms)
 
-        base = _base_callsign(cs)
-        now = time.time()
-        prev = STATE.heard.get(base, {})
-        STATE.heard[base] = {
-            "callsign": base,
-            "snr": snr if isinstance(snr, int) else prev.get("snr"),
-            "grid": grid if isinstance(grid, str) else prev.get("grid"),
-            "freq": freq if freq is not None else prev.get("freq"),
-            "offset": off if off is not None else prev.get("offset"),
-            "utc": utc_ts if utc_ts else prev.get("utc"),
-            "ts": utc_ts if utc_ts else now,
-            "text": prev.get("text"),  # aquí no viene TEXT; conservamos si ya había
-        }
+        base = sys.intern(_base_callsign(cs))
+        prev = STATE.heard.get(base, _NO_HEARD)
+        put_heard(base, HeardEntry(
+            callsign=base,
+            snr=snr if isinstance(snr, int) else prev.snr,
+            grid=grid if isinstance(grid, str) else prev.grid,
+            freq=freq if freq is not None else prev.freq,
+            offset=off if off is not None else prev.offset,
+            utc=utc_ts if utc_ts else prev.utc,
+            ts=utc_ts if utc_ts else now,
+            text=prev.text,  # aquí no viene TEXT; conservamos si ya había
+        ))
         count += 1
 
     return count
@@ -221,33 +235,61 @@ def _dump_activity_debug(val) -> None:
         logger.debug(f"dump_activity_debug error: {e}")
 
 
-_QSO_ID_RE = re.compile(r'[-–—]\s*\((\d+)\)\s*[-–—]')  # busca "- (1234) -" en la línea
+_QSO_DASHES = "-–—"                                      # guiones válidos alrededor de "(1234)"
 END_OF_MSG_RE = re.compile(r'[♢◇♦♧♤♥]\s*$')            # símbolo de fin al final de la línea
+_QSO_FWD_RING = 32                                       # últimos QSO reenviados que recordamos (por hash)
 
 
 def extract_qso_msg_id(line: str) -> str | None:
     """Devuelve el ID del QSO (string) si la línea contiene '- (n) -', si no None."""
     if not isinstance(line, str):
         return None
-    m = _QSO_ID_RE.search(line)
-    return m.group(1) if m else None
+    # Escaneo manual equivalente a [-–—]\s*\((\d+)\)\s*[-–—]
+    lp = line.find("(")
+    while lp >= 0:
+        rp = line.find(")", lp + 1)
+        if rp < 0:
+            return None
+        num = line[lp + 1:rp]
+        if num.isdecimal():
+            i = lp - 1
+            while i >= 0 and line[i].isspace():
+                i -= 1
+            if i >= 0 and line[i] in _QSO_DASHES:
+                j, n = rp + 1, len(line)
+                while j < n and line[j].isspace():
+                    j += 1
+                if j < n and line[j] in _QSO_DASHES:
+                    return num
+        lp = line.find("(", lp + 1)
+    return None
 
 def was_id_forwarded(qso_id: str) -> bool:
-    return qso_id in STATE.qso_forwarded_id_set
+    return qso_id in STATE.qso_forwarded_lru
 
 def remember_forwarded_id(qso_id: str):
     if not qso_id:
         return
-    # purga si nos pasamos del límite
-    if len(STATE.qso_forwarded_ids) >= config.QSO_ID_CACHE_SIZE:
-        old = STATE.qso_forwarded_ids.popleft()
-        STATE.qso_forwarded_id_set.discard(old)
-    STATE.qso_forwarded_ids.append(qso_id)
-    STATE.qso_forwarded_id_set.add(qso_id)
+    d = STATE.qso_forwarded_lru
+    d[qso_id] = None
+    # purga el más antiguo si nos pasamos del límite
+    if len(d) > config.QSO_ID_CACHE_SIZE:
+        d.popitem(last=False)
+
+def seen_inbound(key) -> bool:
+    """True si esta entrada (JS8 o Telegram) ya se procesó; si no, la registra."""
+    d = STATE.inbound_seen
+    if key in d:
+        return True
+    d[key] = None
+    # FIFO acotada: fuera la más antigua
+    if len(d) > getattr(config, "INBOUND_DEDUP_SIZE", 1000):
+        d.popitem(last=False)
+    return False
 
 
-# Caché de TX propios recientes (no toca BridgeState)
-_SENT_RECENT = deque(maxlen=200)
+# Caché de TX propios recientes (no toca BridgeState): (to, msg) -> temporizador que la borra al caducar
+_SENT_RECENT: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
 _SENT_TTL_SEC = 300  # 5 minutos
 
 
@@ -259,26 +301,28 @@ def _norm_to_token(s: str) -> str:
     return _base_callsign(s)
 
 
+_END_SYMBOLS = "♢◇♦♧♤♥"
+
+
 def _clean_msg(s: str) -> str:
     # quita símbolos finales típicos del QSO (diamantes, etc.) y normaliza espacios/mayúsculas
-    t = (s or "").strip()
-    t = re.sub(r"[♢◇♦♧♤♥]+$", "", t).strip()
-    t = re.sub(r"\s+", " ", t)
-    return t.upper()
+    t = (s or "").strip().rstrip(_END_SYMBOLS)
+    return " ".join(t.upper().split())
 
 
 def remember_sent(to: str, msg: str) -> None:
-    _SENT_RECENT.append((_norm_to_token(to), _clean_msg(msg), time.time()))
+    key = (sys.intern(_norm_to_token(to)), _clean_msg(msg))
+    # si se repite el envío, el TTL vuelve a contar desde ahora
+    old = _SENT_RECENT.pop(key, None)
+    if old is not None:
+        old.cancel()
+    # cada entrada se borra sola al caducar: las consultas no purgan nada
+    _SENT_RECENT[key] = asyncio.get_running_loop().call_later(
+        _SENT_TTL_SEC, _SENT_RECENT.pop, key, None)
 
 
-def was_recently_sent(to: str, msg: str, ttl: int = _SENT_TTL_SEC) -> bool:
-    now = time.time()
-    # purga
-    while _SENT_RECENT and now - _SENT_RECENT[0][2] > ttl:
-        _SENT_RECENT.popleft()
-    sig_to = _norm_to_token(to)
-    sig_msg = _clean_msg(msg)
-    return any((t == sig_to and m == sig_msg) for (t, m, ts) in _SENT_RECENT)
+def was_recently_sent(to: str, msg: str) -> bool:
+    return (_norm_to_token(to), _clean_msg(msg)) in _SENT_RECENT
 
 
 async def js8_send_now(callsign: str, text: str):
@@ -309,16 +353,36 @@ def make_tx_message(callsign: str, text: str) -> dict:
         "value": callsign +" "+ text
     }
 
+_NL = b"\n"
+
+def json_dumps_bytes(obj) -> bytes:
+    """JSON en bytes UTF-8, sin salto de línea (orjson si está disponible)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+def json_dumps_line(obj) -> bytes:
+    """Frame JSON terminado en \\n, en bytes UTF-8 (orjson si está disponible)."""
+    return json_dumps_bytes(obj) + _NL
+
+
 def parse_js8_line(line: bytes):
     """
     Devuelve:
       - dict si es un objeto JSON válido
       - None si no es útil (string, null, lista, etc.)
     """
-    try:
-        obj = json.loads(line.decode("utf-8", errors="ignore"))
-    except Exception:
-        return None
+    obj = None
+    if orjson is not None:
+        try:
+            obj = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass  # p. ej. UTF-8 inválido: vía tolerante
+    if obj is None:
+        try:
+            obj = json.loads(line.decode("utf-8", errors="ignore"))
+        except Exception:
+            return None
 
     # JS8Call a veces puede soltar strings/valores simples: ignorarlos
     if isinstance(obj, dict):
@@ -327,59 +391,23 @@ def parse_js8_line(line: bytes):
         return None
     
 
-def extract_from_to_text(evt: dict) -> Optional[tuple[str, str, str]]:
-    """
-    Extrae (FROM, TO, TEXT) de cualquier evento.
-    - Si el TEXT empieza con '@GRUPO' o 'CALLSIGN[:]' lo usamos como TO preferente.
-    - Aunque value['TO'] venga relleno, si el inicio del TEXT nombra un destino, lo priorizamos.
-    """
-    if not isinstance(evt, dict):
-        return None
-    v = evt.get("value")
-    if not isinstance(v, dict):
-        return None
-
-    frm = v.get("FROM") or v.get("from")
-    to  = v.get("TO")   or v.get("to")
-    txt = v.get("TEXT") or v.get("text")
-    if not isinstance(txt, str):
-        return None
-    txt = txt.strip()
-
-    # 1) Intenta sacar destino del propio texto SIEMPRE (prioritario)
-    inferred_to, stripped = _parse_leading_destination(txt)
-
-    # 2) Decide el mejor 'to' a usar:
-    #    - Si el destino inferido del texto apunta a mi o a mis grupos, Lo usamos sino lo quitamos del texto
-    #    - Si no, usa el TO del evento (si existe)
-    chosen_to = None
-    if inferred_to:
-        # Normalizamos para comparar
-        me_base = _base_callsign(MY_CALLSIGN)
-        if inferred_to.startswith("@"):
-            if any(_norm_group(inferred_to) == _norm_group(g) for g in config.MONITORED_GROUPS):
-                chosen_to = inferred_to
-                txt = stripped
-        else:
-            if _base_callsign(inferred_to) == me_base:
-                chosen_to = inferred_to
-                txt = stripped
-
-    if not chosen_to and isinstance(to, str) and to.strip():
-        chosen_to = to.strip()
-
-    if isinstance(frm, str) and isinstance(chosen_to, str) and isinstance(txt, str):
-        return frm.strip(), chosen_to.strip(), txt.strip()
-
-    return None
-
-
 CALLSIGN_RE   = re.compile(r'^(?=.*[A-Z])(?=.*\d)[A-Z0-9/]{3,}(?:-\d{1,2})?$', re.I)
 GRID_FULL_RE  = re.compile(r'^[A-R]{2}\d{2}(?:[A-X]{2})?(?:\d{2})?$', re.I)  # Maidenhead 4/6/8
+GRID_RE       = re.compile(r'\b([A-R]{2}\d{2}(?:[A-X]{2})?(?:\d{2})?)\b', re.I)  # locator dentro de un texto
+DIGIT_CS_RE   = re.compile(r'^(?=.*\d)[A-Z0-9/]{3,}(?:-\d{1,2})?$', re.I)         # indicativo con algún dígito
+LEAD_CS_RE    = re.compile(r'\s*([A-Z0-9/]{3,})\s*[:>]', re.I)                   # "EA1ABC: ..." o "EA1ABC> ..."
+SNR_RE        = re.compile(r'\bSNR\s*([+-]?\d{1,2})\b', re.I)
+# Cortes de consola en el QSO window: cola de indicativo al final / "01:" al principio
+WRAP_TAIL_RE  = re.compile(r'([A-Za-z0-9/+-]{3,})$')
+WRAP_HEAD_RE  = re.compile(r'^\s*(\d{1,3}(?:-\d{1,2})?)([:>].*)$')
 
 
 def _base_callsign(s: str) -> str:
-    return (s or "").strip().split()[0].split("-")[0].upper()
+    # primer token (split con maxsplit para no trocear el resto) sin sufijo -NN
+    parts = (s or "").split(None, 1)
+    if not parts:
+        return ""
+    return parts[0].partition("-")[0].upper()
 
 def _norm_group(s: str) -> str:
     s = (s or "").strip()
@@ -388,13 +416,20 @@ def _norm_group(s: str) -> str:
         return s.upper()
     return ""
 
+# Indicativos/alias propios y grupos vigilados, normalizados una sola vez al arrancar
+_MY_BASES = frozenset(
+    _base_callsign(x)
+    for x in _as_list(getattr(config, "MY_CALLSIGN", [])) + _as_list(getattr(config, "MY_ALIASES", []))
+    if isinstance(x, str) and x.strip()
+)
+_MONITORED_GROUPS_NORM = frozenset(
+    g for g in (_norm_group(x) for x in _as_list(getattr(config, "MONITORED_GROUPS", [])) if isinstance(x, str))
+    if g
+)
+_MY_BASES_TUPLE = tuple(_MY_BASES)  # para str.startswith(tuple)
+
 def is_me(callsign: str) -> bool:
-    base = _base_callsign(callsign)
-    pool = _as_list(getattr(config, "MY_CALLSIGN", [])) + _as_list(getattr(config, "MY_ALIASES", []))
-    return any(
-        isinstance(x, str) and x.strip() and _base_callsign(x) == base
-        for x in pool
-    )
+    return _base_callsign(callsign) in _MY_BASES
 
 def to_is_me_or_monitored_group(to: str) -> bool:
     if not isinstance(to, str):
@@ -403,18 +438,39 @@ def to_is_me_or_monitored_group(to: str) -> bool:
     if is_me(tok):
         return True
     g = _norm_group(tok)
-    if not g:
-        return False
-    monitored = {_norm_group(x) for x in _as_list(getattr(config, "MONITORED_GROUPS", [])) if isinstance(x, str)}
-    return g in monitored
+    return bool(g) and g in _MONITORED_GROUPS_NORM
 
 
 
 RAW_PATTERN = re.compile(
-    r'^\s*([@A-Za-z0-9/+-]+)\s*[:>]\s*(@?[A-Za-z0-9/+-]{3,})\b\s*(.*)$'
+    r'^\s*([@A-Za-z0-9/+-]+)\s*[:>]\s*(@?[A-Za-z0-9/+-]{3,})\b\s*(.*)$', re.ASCII
 )
 # Matchea: "EA4ABC: EA4XXX-10 msg", "EA4ABC>EA4XXX msg", "EA4ABC> @GRUPO msg", etc.
 
+# Líneas del QSO window: prefijos "HH:MM:SS - (n) -" y formato FROM [:|>] TO MENSAJE
+QSO_FROMTO_RE = re.compile(
+    r'^\s*'
+    r'(?:\[\d{2}:\d{2}:\d{2}\]\s*|\d{2}:\d{2}:\d{2}\s*)?'   # [11:22:12] o 11:22:12
+    r'(?:[-–—]?\s*\(\d+\)\s*[-–—]?\s*)?'# - (1546) - (opcional)
+    r'([@A-Za-z0-9/+-]+)\s*[:>]\s*'                        # FROM
+    r'(@?[A-Za-z0-9/+-]{3,})\b\s*'                         # TO
+    r'(.*)$',                                              # MENSAJE (puede ser vacío)
+    re.ASCII,
+)
+
+# Primer carácter posible de FROM en RAW_PATTERN (filtro previo barato)
+_RAW_FIRST_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789@/+-")
+
+
+def match_qso_line(line: str):
+    """QSO_FROMTO_RE.match, descartando sin regex las líneas sin ':' ni '>'."""
+    if ":" not in line and ">" not in line:
+        return None
+    return QSO_FROMTO_RE.match(line)
+
+
+_OWN_LINE_SEPS = frozenset((":", ">", " ", "-", "—", "–", "\t"))
+
 
 def is_own_qso_line(line: str) -> bool:
     if not isinstance(line, str):
@@ -430,14 +486,11 @@ def is_own_qso_line(line: str) -> bool:
             return True
 
     up = s.upper().lstrip()
-    for a in (_as_list(getattr(config, "MY_CALLSIGN", [])) + _as_list(getattr(config, "MY_ALIASES", []))):
-        if not isinstance(a, str):
-            continue
-        base = _base_callsign(a)
-        if up.startswith(base):
-            next_ch = up[len(base):len(base)+1]
-            if next_ch in (":", ">", " ", "-", "—", "–", "\t"):
-                return True
+    if not up.startswith(_MY_BASES_TUPLE):
+        return False
+    for base in _MY_BASES_TUPLE:
+        if up.startswith(base) and up[len(base):len(base)+1] in _OWN_LINE_SEPS:
+            return True
     return False
 
 
@@ -452,6 +505,9 @@ def parse_raw_line_to_triplet(text: str):
     s = text.strip()
     if not s:
         return None
+    # La mayoría de líneas no son "FROM: TO ...": descártalas sin pasar por el regex
+    if s[0] not in _RAW_FIRST_CHARS or (":" not in s and ">" not in s):
+        return None
     m = RAW_PATTERN.match(s)
     if not m:
         return None
@@ -476,42 +532,51 @@ def _parse_leading_destination(txt: str) -> tuple[str, str]:
     if not s:
         return "", txt
 
-    tokens = s.split()
-    if not tokens:
-       return "", txt
+    # Como mucho 3 trozos: primer token, segundo token y el resto tal cual
+    parts = s.split(None, 2)
+    n = len(parts)
 
-    first = tokens[0].rstrip(":;,.")
+    first = parts[0].rstrip(":;,.")
     # Caso 1: grupo al principio
     if first.startswith("@"):
-        dest = first.upper()
-        rest = " ".join(tokens[1:]).strip()
-        return dest, rest
+        return first.upper(), s[len(parts[0]):].lstrip()
 
-    # Caso 3: "FROM: TO ..."
-    if tokens[0].endswith(":") and len(tokens) >= 2:
-        cand = tokens[1].rstrip(":;,.")
+    # Cada token se valida una sola vez y se comparte entre los casos 2, 3 y 4
+    first_is_call = None
+    if n >= 2:
+        cand = parts[1].rstrip(":;,.")
         if cand.startswith("@") or CALLSIGN_RE.match(cand):
-            dest = cand.upper()
-            rest = " ".join(tokens[2:]).strip()
-            return dest, rest
-
-    # Caso 4: "FROM TO Mensaje" (sin dos puntos)
-    if CALLSIGN_RE.match(first) and len(tokens) >= 2:
-        cand = tokens[1].rstrip(":;,.")
-        if cand.startswith("@") or CALLSIGN_RE.match(cand):
-            dest = cand.upper()
-            rest = " ".join(tokens[2:]).strip()
-            return dest, rest
+            # Caso 3: "FROM: TO ..."
+            if parts[0].endswith(":"):
+                return cand.upper(), parts[2] if n > 2 else ""
+            # Caso 4: "FROM TO Mensaje" (sin dos puntos)
+            first_is_call = CALLSIGN_RE.match(first) is not None
+            if first_is_call:
+                return cand.upper(), parts[2] if n > 2 else ""
 
     # Caso 2: "CALLSIGN Mensaje"
-    if CALLSIGN_RE.match(first):
-        dest = first.upper()
-        rest = " ".join(tokens[1:]).strip()
-        return dest, rest
+    if first_is_call is None:
+        first_is_call = CALLSIGN_RE.match(first) is not None
+    if first_is_call:
+        return first.upper(), s[len(parts[0]):].lstrip()
 
     return "", txt
 
 
+_FROM_KEYS = ("FROM", "from")
+_TO_KEYS   = ("TO", "to")
+_TEXT_KEYS = ("TEXT", "text")
+
+
+def _first(d: dict, keys):
+    """Primer valor no vacío de d entre las claves dadas (o None)."""
+    for k in keys:
+        val = d.get(k)
+        if val:
+            return val
+    return None
+
+
 def extract_from_to_text(evt: dict):
     """
     Extrae (FROM, TO, TEXT) de cualquier evento JS8Call que traiga value y TEXT.
@@ -523,9 +588,9 @@ def extract_from_to_text(evt: dict):
     if not isinstance(v, dict):
         return None
 
-    frm = v.get("FROM") or v.get("from")
-    to  = v.get("TO")   or v.get("to")
-    txt = v.get("TEXT") or v.get("text")
+    frm = _first(v, _FROM_KEYS)
+    to  = _first(v, _TO_KEYS)
+    txt = _first(v, _TEXT_KEYS)
     if not isinstance(txt, str):
         return None
     txt = txt.strip()
@@ -542,7 +607,7 @@ def extract_from_to_text(evt: dict):
     return None
 
 
-def parse_rx_spot(evt: dict) -> Optional[dict]:
+def parse_rx_spot(evt: dict) -> Optional["HeardEntry"]:
     """
     Extrae info de un RX.SPOT “estación oída”.
     Campos típicos: CALLSIGN, SNR, GRID, FREQ, OFFSET.
@@ -568,14 +633,14 @@ def parse_rx_spot(evt: dict) -> Optional[dict]:
     freq   = v.get("FREQ")   or v.get("freq")   or v.get("DIAL") or v.get("dial")
     offset = v.get("OFFSET") or v.get("offset")
 
-    return {
-        "callsign": _base_callsign(cs),
-        "snr": snr,
-        "grid": grid if isinstance(grid, str) else None,
-        "freq": freq,
-        "offset": offset,
-        "ts": time.time(),
-    }
+    return HeardEntry(
+        callsign=sys.intern(_base_callsign(cs)),
+        snr=snr,
+        grid=grid if isinstance(grid, str) else None,
+        freq=freq,
+        offset=offset,
+        ts=time.time(),
+    )
 
 
 
@@ -584,7 +649,7 @@ def parse_rx_spot(evt: dict) -> Optional[dict]:
 # ---- Helpers: Call Activity → heard -----------------
 
 
-def update_heard_from_params_offsets_map(params: dict) -> int:
+def update_heard_from_params_offsets_map(params: dict, now: Optional[float] = None) -> int:
     """
     params = {
       "930": {"DIAL":..., "FREQ":..., "OFFSET":..., "SNR":..., "TEXT":"EA1ABC: ...", "UTC": ...},
@@ -596,7 +661,8 @@ def update_heard_from_params_offsets_map(params: dict) -> int:
     if not isinstance(params, dict):
         return 0
 
-    GRID_RE = re.compile(r'\b([A-R]{2}\d{2}(?:[A-X]{2})?(?:\d{2})?)\b', re.I)
+    if now is None:
+        now = time.time()
     count = 0
 
     for k, d in params.items():
@@ -608,7 +674,7 @@ def update_heard_from_params_offsets_map(params: dict) -> int:
         text = (d.get("TEXT") or "").strip()
 
         # Indicativo en TEXT: "EA1ABC: ..." o "EA1ABC> ..."
-        m_cs = re.match(r'\s*([A-Z0-9/]{3,})\s*[:>]', text, re.I)
+        m_cs = LEAD_CS_RE.match(text)
         if m_cs and CALLSIGN_RE.match(m_cs.group(1)):
             cs = m_cs.group(1).upper()
         else:
@@ -627,19 +693,18 @@ def update_heard_from_params_offsets_map(params: dict) -> int:
         if isinstance(utc_ms, (int, float)):
             utc_ts = (utc_ms / 1000.0) if utc_ms > 1e12 else float(utc_ms)
 
-        base = _base_callsign(cs)
-        now = time.time()
-        prev = STATE.heard.get(base, {})
-        STATE.heard[base] = {
-            "callsign": base,
-            "snr": snr if isinstance(snr, int) else prev.get("snr"),
-            "grid": grid if isinstance(grid, str) else prev.get("grid"),
-            "freq": freq if freq is not None else prev.get("freq"),
-            "offset": off if off is not None else prev.get("offset"),
-            "utc": utc_ts if utc_ts else prev.get("utc"),
-            "ts": utc_ts if utc_ts else now,
-            "text": text or prev.get("text"),
-        }
+        base = sys.intern(_base_callsign(cs))
+        prev = STATE.heard.get(base, _NO_HEARD)
+        put_heard(base, HeardEntry(
+            callsign=base,
+            snr=snr if isinstance(snr, int) else prev.snr,
+            grid=grid if isinstance(grid, str) else prev.grid,
+            freq=freq if freq is not None else prev.freq,
+            offset=off if off is not None else prev.offset,
+            utc=utc_ts if utc_ts else prev.utc,
+            ts=utc_ts if utc_ts else now,
+            text=text or prev.text,
+        ))
         count += 1
 
     return count
@@ -700,17 +765,20 @@ def grid_distance_km(grid1: str, grid2: str):
         return None
     return round(haversine_km(p1[0], p1[1], p2[0], p2[1]))
 
+_TOKEN_RE = re.compile(r"[A-Za-z0-9/+-]+")
+
 def _extract_callsign_from_line(line: str) -> Optional[str]:
     if not isinstance(line, str):
         return None
-    tokens = re.findall("[A-Za-z0-9/+-]+", line.upper())
-    for tok in tokens:
+    # Recorre los tokens de uno en uno y para en el primer indicativo
+    for m in _TOKEN_RE.finditer(line):
+        tok = m.group(0)
         if CALLSIGN_RE.match(tok):
             return _base_callsign(tok)
     return None
 
 
-def update_heard_from_call_activity(value):
+def update_heard_from_call_activity(value, now: Optional[float] = None):
     """
     Normaliza la 'pantalla derecha' a STATE.heard.
     Acepta:
@@ -719,7 +787,8 @@ def update_heard_from_call_activity(value):
       - dict mapeando CALLSIGN -> dict(info)
       - str multilinea o JSON en str
     """
-    GRID_RE = re.compile(r'\b([A-R]{2}\d{2}(?:[A-X]{2})?(?:\d{2})?)\b', re.I)
+    if now is None:
+        now = time.time()
 
     def _to_int(x):
         try:
@@ -733,210 +802,237 @@ def update_heard_from_call_activity(value):
     def _push(cs, snr=None, grid=None, freq=None, offset=None):
         if not isinstance(cs, str):
             return
-        base = _base_callsign(cs)
+        base = sys.intern(_base_callsign(cs))
         if not base or not CALLSIGN_RE.match(base) or GRID_FULL_RE.fullmatch(base):
             return
     
         # ⬇️ Nuevo: no metas mi propio indicativo/alias
-        my_bases = {
-            _base_callsign(x)
-            for x in _as_list(getattr(config, "MY_CALLSIGN", []))
-            + _as_list(getattr(config, "MY_ALIASES", []))
-            if isinstance(x, str)
-        }
-        if base in my_bases:
+        if base in _MY_BASES:
             return
         # ⬆️ Fin cambio
     
-        now = time.time()
-        prev = STATE.heard.get(base, {})
-        entry = {
-            "callsign": base,
-            "snr": snr if isinstance(snr, int) else prev.get("snr"),
-            "grid": grid if isinstance(grid, str) else prev.get("grid"),
-            "freq": freq if freq is not None else prev.get("freq"),
-            "offset": offset if offset is not None else prev.get("offset"),
-            "ts": now,
-        }
-        STATE.heard[base] = entry
-
-
-    if value is None:
-        return
-
-    if isinstance(value, (bytes, bytearray)):
-        try:
-            value = bytes(value).decode("utf-8", "ignore")
-        except Exception:
-            value = str(value)
-
-    # str → intenta JSON y luego texto
-    if isinstance(value, str):
-        s = value.strip()
-        if s.startswith("{") or s.startswith("["):
+        prev = STATE.heard.get(base, _NO_HEARD)
+        put_heard(base, HeardEntry(
+            callsign=base,
+            snr=snr if isinstance(snr, int) else prev.snr,
+            grid=grid if isinstance(grid, str) else prev.grid,
+            freq=freq if freq is not None else prev.freq,
+            offset=offset if offset is not None else prev.offset,
+            ts=now,
+        ))
+
+
+    # Bucle en vez de recursión: cada envoltorio (JSON en str, lista anidada,
+    # campo de texto) sustituye a 'value' y se vuelve a procesar
+    while value is not None:
+        if isinstance(value, (bytes, bytearray)):
             try:
-                decoded = json.loads(s)
-                return update_heard_from_call_activity(decoded)
+                value = bytes(value).decode("utf-8", "ignore")
             except Exception:
-                pass
-        for line in s.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            cs = next(
-                (tok for tok in line.split()
-                if CALLSIGN_RE.match(tok) and not GRID_FULL_RE.fullmatch(tok)),
-                None
-            )
-            if not cs:
-                continue
-            m_snr = re.search(r'\bSNR\s*([+-]?\d{1,2})\b', line, re.I)
-            snr = _to_int(m_snr.group(1)) if m_snr else None
-            m_grid = GRID_RE.search(line)
-            grid = m_grid.group(1).upper() if m_grid else None
-            _push(cs, snr, grid)
-        return
+                value = str(value)
 
-    # list
-    if isinstance(value, list):
-        for d in value:
-            if not isinstance(d, dict):
-                continue
-            cs = d.get("CALLSIGN") or d.get("STATION") or d.get("from") or d.get("CALL") or d.get("call")
-            snr = _to_int(d.get("SNR"))
-            grid = d.get("GRID") or d.get("grid") or d.get("LOC") or d.get("locator")
-            freq = d.get("FREQ") or d.get("DIAL")
-            off  = d.get("OFFSET")
-            _push(cs, snr, grid, freq, off)
-        return
+        # str → intenta JSON y luego texto
+        if isinstance(value, str):
+            s = value.strip()
+            if s.startswith("{") or s.startswith("["):
+                try:
+                    value = orjson.loads(s) if orjson is not None else json.loads(s)
+                    continue
+                except Exception:
+                    pass
+            for line in s.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                cs = next(
+                    (tok for tok in line.split()
+                    if CALLSIGN_RE.match(tok) and not GRID_FULL_RE.fullmatch(tok)),
+                    None
+                )
+                if not cs:
+                    continue
+                m_snr = SNR_RE.search(line)
+                snr = _to_int(m_snr.group(1)) if m_snr else None
+                m_grid = GRID_RE.search(line)
+                grid = m_grid.group(1).upper() if m_grid else None
+                _push(cs, snr, grid)
+            return
 
+        # list
+        if isinstance(value, list):
+            for d in value:
+                if not isinstance(d, dict):
+                    continue
+                cs = d.get("CALLSIGN") or d.get("STATION") or d.get("from") or d.get("CALL") or d.get("call")
+                snr = _to_int(d.get("SNR"))
+                grid = d.get("GRID") or d.get("grid") or d.get("LOC") or d.get("locator")
+                freq = d.get("FREQ") or d.get("DIAL")
+                off  = d.get("OFFSET")
+                _push(cs, snr, grid, freq, off)
+            return
 
-    # dict
-    if isinstance(value, dict):
-        # a) nombres comunes de lista
-        for key in ("stations","STATIONS","list","LIST","items","ITEMS","activity","ACTIVITY","values","VALUES"):
-            lst = value.get(key)
-            if isinstance(lst, list):
-                update_heard_from_call_activity(lst)
-                return
-            if isinstance(lst, dict):
-                # por si anidan otra lista dentro
-                for _k, _v in lst.items():
-                    if isinstance(_v, list):
-                        update_heard_from_call_activity(_v)
-                        return
-                                # 4.b) Mapa de offsets (claves numéricas en 'params'): {"930": {...}, "950": {...}, "_ID": ...}
-                keys = list(value.keys())
-                is_offset_map = keys and all(isinstance(k, str) and (k.isdigit() or k.startswith("_")) for k in keys)
-                if is_offset_map:
-                    GRID_RE = re.compile(r'\b([A-R]{2}\d{2}(?:[A-X]{2})?(?:\d{2})?)\b', re.I)
-        
-                    def _to_int(x):
-                        try:
-                            return int(x)
-                        except Exception:
+
+        # dict
+        if isinstance(value, dict):
+            # a) nombres comunes de lista
+            nested = None
+            for key in ("stations","STATIONS","list","LIST","items","ITEMS","activity","ACTIVITY","values","VALUES"):
+                lst = value.get(key)
+                if isinstance(lst, list):
+                    nested = lst
+                    break
+                if isinstance(lst, dict):
+                    # por si anidan otra lista dentro
+                    for _k, _v in lst.items():
+                        if isinstance(_v, list):
+                            nested = _v
+                            break
+                    if nested is not None:
+                        break
+                                    # 4.b) Mapa de offsets (claves numéricas en 'params'): {"930": {...}, "950": {...}, "_ID": ...}
+                    keys = list(value.keys())
+                    is_offset_map = keys and all(isinstance(k, str) and (k.isdigit() or k.startswith("_")) for k in keys)
+                    if is_offset_map:
+                        def _to_int(x):
                             try:
-                                return int(round(float(x)))
+                                return int(x)
                             except Exception:
-                                return None
+                                try:
+                                    return int(round(float(x)))
+                                except Exception:
+                                    return None
         
-                    for k, d in value.items():
-                        if not isinstance(d, dict):
-                            continue
-                        text = (d.get("TEXT") or "").strip()
+                        for k, d in value.items():
+                            if not isinstance(d, dict):
+                                continue
+                            text = (d.get("TEXT") or "").strip()
         
-                        # Indicativo en TEXT: "EA1ABC: ..." o "EA1ABC> ..."
-                        # (bloque is_offset_map de list/dict, primera extracción)
-                        m_cs = re.match(r'\s*([A-Z0-9/]{3,})\s*[:>]', text, re.I)
-                        if m_cs:
-                            cand = m_cs.group(1).upper()
-                            cs = cand if (CALLSIGN_RE.match(cand) and not GRID_FULL_RE.fullmatch(cand)) else None
-                        if not cs:
-                            cs = next(
-                                (tok.upper() for tok in text.split()
-                                 if CALLSIGN_RE.match(tok) and not GRID_FULL_RE.fullmatch(tok)),
-                                None
-                        )
+                            # Indicativo en TEXT: "EA1ABC: ..." o "EA1ABC> ..."
+                            # (bloque is_offset_map de list/dict, primera extracción)
+                            m_cs = LEAD_CS_RE.match(text)
+                            if m_cs:
+                                cand = m_cs.group(1).upper()
+                                cs = cand if (CALLSIGN_RE.match(cand) and not GRID_FULL_RE.fullmatch(cand)) else None
+                            if not cs:
+                                cs = next(
+                                    (tok.upper() for tok in text.split()
+                                     if CALLSIGN_RE.match(tok) and not GRID_FULL_RE.fullmatch(tok)),
+                                    None
+                            )
 
         
-                        snr  = _to_int(d.get("SNR"))
-                        m_g  = GRID_RE.search(text)
-                        grid = m_g.group(1).upper() if m_g else None
-                        freq = d.get("FREQ") or d.get("DIAL")
-                        off  = d.get("OFFSET")
-                        utc_ms = d.get("UTC")
-                        utc_ts = None
-                        if isinstance(utc_ms, (int, float)):
-                            utc_ts = (utc_ms / 1000.0) if utc_ms > 1e12 else float(utc_ms)
+                            snr  = _to_int(d.get("SNR"))
+                            m_g  = GRID_RE.search(text)
+                            grid = m_g.group(1).upper() if m_g else None
+                            freq = d.get("FREQ") or d.get("DIAL")
+                            off  = d.get("OFFSET")
+                            utc_ms = d.get("UTC")
+                            utc_ts = None
+                            if isinstance(utc_ms, (int, float)):
+                                utc_ts = (utc_ms / 1000.0) if utc_ms > 1e12 else float(utc_ms)
         
-                        if cs:
-                            base = _base_callsign(cs)
-                            now = time.time()
-                            prev = STATE.heard.get(base, {})
-                            STATE.heard[base] = {
-                                "callsign": base,
-                                "snr": snr if isinstance(snr, int) else prev.get("snr"),
-                                "grid": grid if isinstance(grid, str) else prev.get("grid"),
-                                "freq": freq if freq is not None else prev.get("freq"),
-                                "offset": off if off is not None else prev.get("offset"),
-                                "utc": utc_ts if utc_ts else prev.get("utc"),
-                                "ts": utc_ts if utc_ts else now,   # usa tiempo real si viene
-                                "text": text or prev.get("text"),
-                            }
-                    return
-
-
-        # b) mapa CALLSIGN -> dict(info)
-        keys = list(value.keys())
-        looks = [k for k in keys if isinstance(k, str) and CALLSIGN_RE.match(k)]
-        if looks and len(looks) >= max(1, int(0.6 * len(keys))):
-            for cs, info in value.items():
-                if not isinstance(cs, str):
-                    continue
-                if isinstance(info, dict):
-                    snr  = _to_int(info.get("SNR"))
-                    grid = info.get("GRID") or info.get("grid") or info.get("LOC") or info.get("locator")
-                    freq = info.get("FREQ") or info.get("freq") or info.get("DIAL") or info.get("dial")
-                    off  = info.get("OFFSET") or info.get("offset")
-                    _push(cs, snr, grid, freq, off)
-                else:
-                    _push(cs)
-            return
+                            if cs:
+                                base = sys.intern(_base_callsign(cs))
+                                prev = STATE.heard.get(base, _NO_HEARD)
+                                put_heard(base, HeardEntry(
+                                    callsign=base,
+                                    snr=snr if isinstance(snr, int) else prev.snr,
+                                    grid=grid if isinstance(grid, str) else prev.grid,
+                                    freq=freq if freq is not None else prev.freq,
+                                    offset=off if off is not None else prev.offset,
+                                    utc=utc_ts if utc_ts else prev.utc,
+                                    ts=utc_ts if utc_ts else now,   # usa tiempo real si viene
+                                    text=text or prev.text,
+                                ))
+                        return
+            if nested is not None:
+                value = nested
+                continue
 
-        # c) un solo objeto estación
-        cs = value.get("CALLSIGN") or value.get("STATION") or value.get("from") or value.get("CALL") or value.get("call")
-        if cs:
-            snr  = _to_int(value.get("SNR"))
-            grid = value.get("GRID") or value.get("grid") or value.get("LOC") or value.get("locator")
-            freq = value.get("FREQ") or value.get("freq") or value.get("DIAL") or value.get("dial")
-            off  = value.get("OFFSET") or value.get("offset")
-            _push(cs, snr, grid, freq, off)
-            return
 
-        # d) campos de texto
-        for k in ("text","TEXT","raw","RAW","dump","DUMP","value","VALUE"):
-            txt = value.get(k)
-            if isinstance(txt, (str, list, dict)):
-                update_heard_from_call_activity(txt)
+            # b) mapa CALLSIGN -> dict(info)
+            keys = list(value.keys())
+            looks = [k for k in keys if isinstance(k, str) and CALLSIGN_RE.match(k)]
+            if looks and len(looks) >= max(1, int(0.6 * len(keys))):
+                for cs, info in value.items():
+                    if not isinstance(cs, str):
+                        continue
+                    if isinstance(info, dict):
+                        snr  = _to_int(info.get("SNR"))
+                        grid = info.get("GRID") or info.get("grid") or info.get("LOC") or info.get("locator")
+                        freq = info.get("FREQ") or info.get("freq") or info.get("DIAL") or info.get("dial")
+                        off  = info.get("OFFSET") or info.get("offset")
+                        _push(cs, snr, grid, freq, off)
+                    else:
+                        _push(cs)
+                return
+
+            # c) un solo objeto estación
+            cs = value.get("CALLSIGN") or value.get("STATION") or value.get("from") or value.get("CALL") or value.get("call")
+            if cs:
+                snr  = _to_int(value.get("SNR"))
+                grid = value.get("GRID") or value.get("grid") or value.get("LOC") or value.get("locator")
+                freq = value.get("FREQ") or value.get("freq") or value.get("DIAL") or value.get("dial")
+                off  = value.get("OFFSET") or value.get("offset")
+                _push(cs, snr, grid, freq, off)
                 return
+
+            # d) campos de texto
+            for k in ("text","TEXT","raw","RAW","dump","DUMP","value","VALUE"):
+                txt = value.get(k)
+                if isinstance(txt, (str, list, dict)):
+                    value = txt
+                    break
+            else:
+                return
+            continue
         return
 
 
 
 # --------------- Estados compartidos ----------------
 
+@dataclass(slots=True)
+class HeardEntry:
+    """Estación oída (panel derecho / RX.SPOT). Con slots: mucho más ligera que un dict."""
+    callsign: str
+    snr: Optional[int] = None
+    grid: Optional[str] = None
+    freq: object = None
+    offset: object = None
+    utc: Optional[float] = None
+    ts: float = 0.0
+    text: Optional[str] = None
+
+    def __post_init__(self):
+        # los locators se repiten mucho entre estaciones: una sola copia de cada uno
+        if isinstance(self.grid, str):
+            self.grid = sys.intern(self.grid)
+
+_NO_HEARD = HeardEntry("")  # "prev" vacío cuando la estación aún no estaba
+
 @dataclass
 class BridgeState:
     last_from_per_chat: Dict[int, str] = field(default_factory=dict)  # chat_id -> last callsign
     js8_connected: bool = False
     js8_last_error: Optional[str] = None
-    heard: Dict[str, dict] = field(default_factory=dict)   # NEW: callsign -> info
+    js8_disconnected: asyncio.Event = field(default_factory=asyncio.Event)  # lo activa read_loop al caer TCP
+    heard: OrderedDict = field(default_factory=OrderedDict)   # callsign -> HeardEntry (LRU acotado)
     qso_last_text: str = ""   # ← NUEVO: última copia del QSO window
-    qso_forwarded_ids: deque = field(default_factory=deque)  # cola de IDs enviados
-    qso_forwarded_id_set: set = field(default_factory=set)   # set para O(1) contains
+    qso_forwarded_lru: OrderedDict = field(default_factory=OrderedDict)  # IDs enviados, en orden de llegada
+    inbound_seen: OrderedDict = field(default_factory=OrderedDict)       # entradas ya procesadas (anti-duplicados)
 
 STATE = BridgeState()
 
+
+def put_heard(base: str, entry: HeardEntry):
+    """Guarda/actualiza una estación oída; si nos pasamos del límite, sale la que lleva más sin oírse."""
+    heard = STATE.heard
+    heard[base] = entry
+    heard.move_to_end(base)
+    if len(heard) > getattr(config, "HEARD_MAX_SIZE", 5000):
+        heard.popitem(last=False)
+
 # ------------- Cliente JS8 (TCP/UDP) Async ----------
 
 class JS8ClientTCP:
@@ -956,42 +1052,60 @@ class JS8ClientTCP:
         logger.info("Conectado a JS8Call (TCP).")
         self.task = asyncio.create_task(self.read_loop())
 
+    READ_CHUNK = 65536
+
     async def read_loop(self):
         try:
+            # Lee todo lo disponible de una vez y procesa cada línea completa;
+            # lo que quede tras el último '\n' espera al siguiente bloque
+            buf = bytearray()
             while True:
-                line = await self.reader.readline()
-                if not line:
+                chunk = await self.reader.read(self.READ_CHUNK)
+                if not chunk:
+                    if buf.strip():
+                        await self._handle_line(buf)
                     raise ConnectionError("Conexión cerrada por JS8Call.")
-                evt = parse_js8_line(line)
-                if evt:
-                    try:
-                        await self.on_event(evt)
-                    except Exception as e:
-                        logger.error(f"on_js8_event error: {e}", exc_info=e)
+                buf += chunk
+                last_nl = buf.rfind(b"\n")
+                if last_nl == -1:
                     continue
-
-
-                # Fallback: intenta parsear la línea como texto crudo
-                text_line = line.decode("utf-8", errors="ignore").strip()
-                triplet = parse_raw_line_to_triplet(text_line)
-                if triplet:
-                    frm, to, txt = triplet
-                    logger.debug(f"RAW match ← JS8: FROM={frm} TO={to} TEXT={txt}")
-                    # usa el manejador crudo
-                    await on_raw_triplet(frm, to, txt)
-                else:
-                    logger.debug(f"Frame no-JSON/no-RAW: {text_line!r}")
+                lines = buf[:last_nl].split(b"\n")
+                del buf[:last_nl + 1]
+                for line in lines:
+                    if line.strip():
+                        await self._handle_line(line)
 
         except Exception as e:
             STATE.js8_connected = False
             STATE.js8_last_error = str(e)
+            STATE.js8_disconnected.set()
             logger.error(f"JS8 TCP desconectado: {e}")
 
+    async def _handle_line(self, line: bytes):
+        evt = parse_js8_line(line)
+        if evt:
+            try:
+                await self.on_event(evt)
+            except Exception as e:
+                logger.error(f"on_js8_event error: {e}", exc_info=e)
+            return
+
+        # Fallback: intenta parsear la línea como texto crudo
+        text_line = line.decode("utf-8", errors="ignore").strip()
+        triplet = parse_raw_line_to_triplet(text_line)
+        if triplet:
+            frm, to, txt = triplet
+            logger.debug(f"RAW match ← JS8: FROM={frm} TO={to} TEXT={txt}")
+            # usa el manejador crudo
+            await on_raw_triplet(frm, to, txt)
+        else:
+            logger.debug(f"Frame no-JSON/no-RAW: {text_line!r}")
+
     async def send(self, obj: dict):
         if not self.writer:
             raise ConnectionError("No conectado a JS8 (TCP).")
-        data = (json.dumps(obj) + "\n").encode("utf-8")
-        self.writer.write(data)
+        # JSON y '\n' como dos trozos: sin concatenar ni recodificar el frame
+        self.writer.writelines((json_dumps_bytes(obj), _NL))
         await self.writer.drain()
 
 class JS8ClientUDP:
@@ -1035,19 +1149,44 @@ class JS8ClientUDP:
     async def send(self, obj: dict):
         if not self.transport:
             raise ConnectionError("No conectado a JS8 (UDP).")
-        data = (json.dumps(obj) + "\n").encode("utf-8")
+        data = json_dumps_line(obj)
         # Enviamos al host/puerto objetivo
         self.transport.sendto(data, (self.host, self.port))
 
 class _UDPProtocol(asyncio.DatagramProtocol):
+    """
+    Encola los eventos recibidos y los procesa en orden con una única tarea
+    consumidora, en vez de crear una Task por datagrama.
+    """
+    QUEUE_MAX = 1000
+
     def __init__(self, on_event):
         self.on_event = on_event
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_MAX)
+        self.consumer: Optional[asyncio.Task] = None
+
+    def connection_made(self, transport):
+        self.consumer = asyncio.create_task(self._consume())
+
+    def connection_lost(self, exc):
+        if self.consumer:
+            self.consumer.cancel()
 
     def datagram_received(self, data, addr):
         evt = parse_js8_line(data)
         if evt:
-            # Ejecutamos on_event en el loop
-          asyncio.create_task(self.on_event(evt))
+            try:
+                self.queue.put_nowait(evt)
+            except asyncio.QueueFull:
+                logger.warning("Cola UDP llena: evento JS8 descartado")
+
+    async def _consume(self):
+        while True:
+            evt = await self.queue.get()
+            try:
+                await self.on_event(evt)
+            except Exception as e:
+                logger.error(f"on_js8_event error: {e}", exc_info=e)
 
 async def on_raw_triplet(frm: str, to: str, txt: str):
     # Evita eco propio
@@ -1097,6 +1236,7 @@ class JS8TelegramBridge:
     def __init__(self):
         self.js8 = None  # JS8ClientTCP | JS8ClientUDP
         self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None  # refresco CALL/BAND en curso (compartido)
 
     async def start_js8(self):
         if config.TRANSPORT.upper() == "TCP":
@@ -1118,6 +1258,18 @@ class JS8TelegramBridge:
             await self.js8.connect()
 
 
+    def _add_waiter(self, event_type: str) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(event_type, []).append(fut)
+        return fut
+
+    def _drop_waiter(self, event_type: str, fut: asyncio.Future):
+        lst = self._waiters.get(event_type)
+        if lst and fut in lst:
+            lst.remove(fut)
+            if not lst:
+                del self._waiters[event_type]
+
     def _notify_waiters(self, event_type: str, value):
         lst = self._waiters.pop(event_type, [])
         for fut in lst:
@@ -1128,35 +1280,36 @@ class JS8TelegramBridge:
     async def get_heard_snapshot(self, timeout: float = 3.5) -> bool:
         if not self.js8 or not STATE.js8_connected:
             return False
-        await self.js8.send({"type": "RX.GET_CALL_ACTIVITY", "params": {}, "value": ""})
-        await asyncio.sleep(0)
-        await self.js8.send({"type": "RX.GET_BAND_ACTIVITY", "params": {}, "value": ""})
-    
-        deadline = time.monotonic() + timeout
-        while time.monotonic() < deadline:
-            if STATE.heard:
-                return True
-            await asyncio.sleep(0.2)
+        # Single-flight: /stations y /rescan seguidos comparten el mismo refresco
+        # en vez de pedir dos veces CALL/BAND activity a JS8Call
+        task = self._refresh_task
+        if task is None or task.done():
+            task = self._refresh_task = asyncio.create_task(self._refresh_heard(timeout))
+        # shield: si se cancela un llamante, el refresco sigue para los demás
+        return await asyncio.shield(task)
+
+    async def _refresh_heard(self, timeout: float) -> bool:
+        # Espera a las respuestas reales de JS8Call (o al timeout), sin sondear STATE.heard
+        waits = {et: self._add_waiter(et) for et in ("RX.CALL_ACTIVITY", "RX.BAND_ACTIVITY")}
+        try:
+            await self.js8.send({"type": "RX.GET_CALL_ACTIVITY", "params": {}, "value": ""})
+            await self.js8.send({"type": "RX.GET_BAND_ACTIVITY", "params": {}, "value": ""})
+            await asyncio.wait(waits.values(), timeout=timeout)
+        finally:
+            for et, fut in waits.items():
+                fut.cancel()
+                self._drop_waiter(et, fut)
         return bool(STATE.heard)
 
 
     async def on_js8_event(self, evt: dict):
         
-        # Patrones: prefijos "HH:MM:SS - (n) -" y formato FROM [:|>] TO MENSAJE
-        QSO_FROMTO_RE = re.compile(
-            r'^\s*'
-            r'(?:\[\d{2}:\d{2}:\d{2}\]\s*|\d{2}:\d{2}:\d{2}\s*)?'   # [11:22:12] o 11:22:12
-            r'(?:[-–—]?\s*\(\d+\)\s*[-–—]?\s*)?'# - (1546) - (opcional)
-            r'([@A-Za-z0-9/+-]+)\s*[:>]\s*'                        # FROM
-            r'(@?[A-Za-z0-9/+-]{3,})\b\s*'                         # TO
-            r'(.*)$'                                               # MENSAJE (puede ser vacío)
-        )
-    
         # ====== 1) QSO window (RX.TEXT) ======
         if isinstance(evt, dict) and evt.get("type") == "RX.TEXT":
             full_text = evt.get("value") or ""
             if not isinstance(full_text, str):
                 return
+            now = time.monotonic()  # una sola lectura de reloj para todo el evento
     
             # Solo líneas COMPLETAS hasta el último '\n'; guarda aparte la línea en construcción
             last_nl = full_text.rfind('\n')
@@ -1168,17 +1321,24 @@ class JS8TelegramBridge:
             if not hasattr(self, "_qso_pending_text"):
                 self._qso_pending_text = ""
                 self._qso_pending_since = 0.0
-            if not hasattr(self, "_qso_last_forwarded"):
-                self._qso_last_forwarded = ""
+            if not hasattr(self, "_qso_fwd_hashes"):
+                # Anillo de hashes (FROM, TO, cuerpo) + set espejo para consultas O(1)
+                self._qso_fwd_ring = deque(maxlen=_QSO_FWD_RING)
+                self._qso_fwd_hashes = set()
     
             # ===== dif por líneas (procesar SOLO lo nuevo) =====
             old = getattr(STATE, "qso_last_text", "") or ""
-            old_lines = old.splitlines(keepends=True)
-            new_lines = stable_text.splitlines(keepends=True)
-            i = 0
-            while i < len(old_lines) and i < len(new_lines) and old_lines[i] == new_lines[i]:
-                i += 1
-            tail_lines = new_lines[i:]  # ← solo líneas nuevas completas
+            if stable_text.startswith(old):
+                # Caso normal: el QSO window solo crece → basta con lo que hay tras la copia anterior
+                tail_lines = stable_text[len(old):].splitlines(keepends=True)
+            else:
+                # Ventana borrada o recortada: comparar línea a línea
+                old_lines = old.splitlines(keepends=True)
+                new_lines = stable_text.splitlines(keepends=True)
+                i = 0
+                while i < len(old_lines) and i < len(new_lines) and old_lines[i] == new_lines[i]:
+                    i += 1
+                tail_lines = new_lines[i:]  # ← solo líneas nuevas completas
     
             # ---------- NUEVO: “desenvolver” wraps de consola ----------
             def _unwrap_wrap(lines: list[str]) -> list[str]:
@@ -1197,9 +1357,9 @@ class JS8TelegramBridge:
                     if out:
                         prev = out[-1]
                         # cola candidata del prev: token alfanumérico (≥3) al final
-                        m1 = re.search(r'([A-Za-z0-9/+-]{3,})$', prev)
+                        m1 = WRAP_TAIL_RE.search(prev)
                         # cabeza de la actual: SOLO dígitos (con posible -NN) seguidos de ':' o '>'
-                        m2 = re.match(r'^\s*(\d{1,3}(?:-\d{1,2})?)([:>].*)$', ln)
+                        m2 = WRAP_HEAD_RE.match(ln)
                         if m1 and m2:
                             prev_tail = m1.group(1)
                             # debe parecer prefijo real de un indicativo: letras + dígitos (p.ej. '30QXT')
@@ -1219,20 +1379,9 @@ class JS8TelegramBridge:
             # Actualiza snapshot DESPUÉS de calcular y “desenvolver” el tail
             STATE.qso_last_text = stable_text
     
-            my_aliases = _as_list(getattr(config, "MY_ALIASES", []))
-            my_calls   = _as_list(getattr(config, "MY_CALLSIGN", []))
-            my_groups  = _as_list(getattr(config, "MONITORED_GROUPS", []))
-            allowed_calls  = { _base_callsign(a) for a in (my_aliases + my_calls) if isinstance(a, str) and a.strip() }
-            allowed_groups = { _norm_group(g)    for g in my_groups if isinstance(g, str) and _norm_group(g) }
-    
-            def _is_me_strict(tok: str) -> bool:
-                base = _base_callsign(tok)
-                all_my = my_aliases + my_calls
-                return any(_base_callsign(a) == base for a in all_my if isinstance(a, str) and a.strip())
-    
             async def _parse_and_maybe_forward(line: str, source: str) -> bool:
                 """Parsea una línea del QSO y la reenvía si procede; devuelve True si se envió."""
-                m = QSO_FROMTO_RE.match(line)
+                m = match_qso_line(line)
                 if not m:
                     return False
     
@@ -1242,7 +1391,7 @@ class JS8TelegramBridge:
                 raw_msg = (msg     or "")
     
                 # Limpia adornos finales (solo para anti-eco y vacíos); el “gate” usa raw_msg
-                msg_clean = re.sub(r"[♢◇♦♧♤♥]+$", "", raw_msg).strip()
+                msg_clean = raw_msg.rstrip(_END_SYMBOLS).strip()
     
                 # ID del QSO (si existe en la línea)
                 qso_id = extract_qso_msg_id(line)
@@ -1265,7 +1414,7 @@ class JS8TelegramBridge:
                     return False
     
                 # no eco propio
-                if _is_me_strict(from_cs):
+                if is_me(from_cs):
                     return False
     
                 # destino debe ser yo o grupo vigilado
@@ -1279,12 +1428,17 @@ class JS8TelegramBridge:
                 except NameError:
                     pass
     
-                # evita duplicado literal inmediato
-                if line == self._qso_last_forwarded:
+                # evita duplicados recientes (mismo FROM + TO + cuerpo)
+                h = hash((from_cs, to_tok.upper(), msg_clean))
+                if h in self._qso_fwd_hashes:
                     return False
     
                 # ✅ reenviar (mensaje completo con símbolo de fin)
-                self._qso_last_forwarded = line
+                ring = self._qso_fwd_ring
+                if len(ring) == ring.maxlen:
+                    self._qso_fwd_hashes.discard(ring[0])
+                ring.append(h)
+                self._qso_fwd_hashes.add(h)
                 await send_to_telegram(t("rx_qso_line", line=line))
     
                 # Marca el ID como reenviado y limpia parcial
@@ -1304,14 +1458,14 @@ class JS8TelegramBridge:
     
             # ---- 1.b) Línea final sin '\n' (en vivo) ----
             if trailing:
-                if QSO_FROMTO_RE.match(trailing):
+                if match_qso_line(trailing):
                     if END_OF_MSG_RE.search(trailing):
                         # Símbolo de fin presente: envía ya
                         await _parse_and_maybe_forward(trailing, "trailing-immediate")
                     else:
                         # Pendiente hasta que llegue el símbolo
                         self._qso_pending_text = trailing
-                        self._qso_pending_since = time.time()
+                        self._qso_pending_since = now
                 else:
                     self._qso_pending_text = ""
                     self._qso_pending_since = 0.0
@@ -1341,6 +1495,7 @@ class JS8TelegramBridge:
             except Exception as ex:
                 logger.debug(f"CALL_ACTIVITY parse error: {ex}")
             finally:
+                self._notify_waiters("RX.CALL_ACTIVITY", evt)
                 return
     
         # ====== 3) RX.BAND_ACTIVITY → heard list ======
@@ -1356,15 +1511,16 @@ class JS8TelegramBridge:
             except Exception as ex:
                 logger.debug(f"BAND_ACTIVITY parse error: {ex}")
             finally:
+                self._notify_waiters("RX.BAND_ACTIVITY", evt)
                 return
     
         # ====== 4) RX.SPOT → heard list (opcional) ======
         if isinstance(evt, dict) and evt.get("type") == "RX.SPOT":
             try:
                 spot = parse_rx_spot(evt)
-                if spot and isinstance(spot.get("callsign"), str):
-                    STATE.heard[spot["callsign"]] = spot
-                    logger.debug(f"RX.SPOT: +{spot['callsign']} snr={spot.get('snr')} grid={spot.get('grid')}")
+                if spot and isinstance(spot.callsign, str):
+                    put_heard(spot.callsign, spot)
+                    logger.debug(f"RX.SPOT: +{spot.callsign} snr={spot.snr} grid={spot.grid}")
             except Exception as ex:
                 logger.debug(f"RX.SPOT parse error: {ex}")
             finally:
@@ -1380,7 +1536,7 @@ class JS8TelegramBridge:
     
         frm, to, txt = triplet
         basef = _base_callsign(frm)
-        if any(_base_callsign(a) == basef for a in _as_list(getattr(config, "MY_ALIASES", [])) + _as_list(getattr(config, "MY_CALLSIGN", []))):
+        if basef in _MY_BASES:
             return
         if not to_is_me_or_monitored_group(to):
             return
@@ -1389,6 +1545,13 @@ class JS8TelegramBridge:
                 return
         except NameError:
             pass
+
+        # Mismo frame entregado dos veces (p.ej. tras reconectar): el UTC de JS8Call lo identifica
+        v = evt.get("value")
+        utc = (v.get("UTC") or v.get("utc")) if isinstance(v, dict) else None
+        if utc and seen_inbound(("js8", frm, to, txt, utc)):
+            logger.debug(f"Frame JS8 duplicado ignorado: {frm} → {to}")
+            return
     
         await send_to_telegram(t("rx_generic", frm=frm, to=to, txt=txt))
 
@@ -1420,6 +1583,13 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
     logger.error("Unhandled exception in handler", exc_info=err)
 
 
+async def drop_duplicate_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Update repetido (p.ej. reintento del long-poll): se corta antes de cualquier handler
+    if seen_inbound(("tg", update.update_id)):
+        logger.debug(f"Update de Telegram duplicado ignorado: {update.update_id}")
+        raise ApplicationHandlerStop
+
+
 async def restricted_chat(update: Update) -> bool:
     # Solo aceptamos mensajes del chat configurado
     chat_id = update.effective_chat.id if update.effective_chat else None
@@ -1430,22 +1600,6 @@ async def restricted_chat(update: Update) -> bool:
 
 # --------------- Telegram Commands  -----------------
 
-async def cmd_rescan(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await restricted_chat(update):
-        return
-    try:
-        if BRIDGE.js8 and STATE.js8_connected:
-            await BRIDGE.js8.send({"type": "RX.GET_CALL_ACTIVITY", "params": {}})
-            await asyncio.sleep(1.2)
-            await BRIDGE.js8.send({"type": "RX.GET_BAND_ACTIVITY", "params": {}})
-            await asyncio.sleep(0.6)
-    except Exception as e:
-        logger.debug(f"rescan error: {e}")
-    await update.effective_message.reply_text(
-        f"Heard en memoria: {len(STATE.heard)} estaciones."
-    )
-
-
 async def cmd_heartbeat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # 1) primero valida el chat
     if not await restricted_chat(update):
@@ -1503,30 +1657,37 @@ async def cmd_stations(update: Update, context: ContextTypes.DEFAULT_TYPE):
         now = time.time()
         my_grid = getattr(config, "GRID", None)
 
-        # Ordena por timestamp real (UTC si lo tenemos)
-        entries = sorted(
-            STATE.heard.values(),
-            key=lambda e: (e.get("utc") or e.get("ts") or 0),
-            reverse=True,
-        )
+        # Por timestamp real (UTC si lo tenemos), más reciente primero. Heap en vez de
+        # ordenar todo: solo se extraen las entradas que llegan a mostrarse (~limit)
+        def _by_recency():
+            heap = [(-(e.utc or e.ts or 0), i, e) for i, e in enumerate(STATE.heard.values())]
+            heapq.heapify(heap)
+            while heap:
+                yield heapq.heappop(heap)[2]
+
+        entries = _by_recency()
+
+        # El texto de la edad solo depende de los minutos: se formatea una vez por minuto distinto
+        age_by_min: Dict[int, str] = {}
 
         def _age(ts: float) -> str:
             if not ts:
                 return "—"
-            delta = max(0, int(now - ts))
-            if delta < 3600:
-                return f"{delta//60}m"
-            if delta < 86400:
-                return f"{delta//3600}h"
-            return f"{delta//86400}d"
+            mins = max(0, int(now - ts)) // 60
+            age = age_by_min.get(mins)
+            if age is None:
+                hours = mins // 60
+                age = f"{mins}m" if not hours else f"{hours}h" if hours < 24 else f"{hours // 24}d"
+                age_by_min[mins] = age
+            return age
 
       
-        def _derive_callsign(e: dict) -> str | None:
-            cs = (e.get("callsign") or "").upper()
+        def _derive_callsign(e: HeardEntry) -> str | None:
+            cs = (e.callsign or "").upper()
             if CALLSIGN_RE.match(cs) and not GRID_FULL_RE.fullmatch(cs):
                 return cs
-            txt = (e.get("text") or "").strip()
-            m = re.match(r'\s*([A-Z0-9/]{3,})\s*[:>]', txt, re.I)
+            txt = (e.text or "").strip()
+            m = LEAD_CS_RE.match(txt)
             if m:
                 cand = m.group(1).upper()
                 if CALLSIGN_RE.match(cand) and not GRID_FULL_RE.fullmatch(cand):
@@ -1538,35 +1699,18 @@ async def cmd_stations(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return None
 
 
-        def _derive_grid(e: dict) -> str:
-            grid = e.get("grid") or ""
+        def _derive_grid(e: HeardEntry) -> str:
+            grid = e.grid or ""
             if grid:
                 return grid
-            txt = (e.get("text") or "")
-            m = re.search(r'\b([A-R]{2}\d{2}(?:[A-X]{2})?(?:\d{2})?)\b', txt, re.I)
+            txt = (e.text or "")
+            m = GRID_RE.search(txt)
             return m.group(1).upper() if m else ""
 
-        # --- Plantillas i18n (con fallback) ---
-        try:
-            header_tpl = t("stations_header")
-        except Exception:
-            header_tpl = "📋 Recently heard (top {n} / total {total}):"
-
-        try:
-            line_tpl = t("stations_line")
-        except Exception:
-            line_tpl = "{cs:<9} {dist:<8} SNR {snr:<4} {grid:<6} {age} ago"
-
-        # --- Filtros locales mínimos (no tocamos regex globales) ---
-        DIGIT_CS_RE = re.compile(r'^(?=.*\d)[A-Z0-9/]{3,}(?:-\d{1,2})?$', re.I)
-        GRID_FULL_RE = re.compile(r'^[A-R]{2}\d{2}(?:[A-X]{2})?(?:\d{2})?$', re.I)
+        # --- Plantillas i18n (cacheadas; sin formatear) ---
+        header_tpl = template("stations_header")
+        line_fmt = template("stations_line").format
 
-        my_bases = {
-            _base_callsign(x) for x in (_as_list(getattr(config, "MY_CALLSIGN", []))
-                                        + _as_list(getattr(config, "MY_ALIASES", [])))
-            if isinstance(x, str) and x.strip()
-        }
-      
         # --- Construcción de líneas usando i18n ---
         lines = []
         count = 0
@@ -1577,7 +1721,7 @@ async def cmd_stations(update: Update, context: ContextTypes.DEFAULT_TYPE):
             base = _base_callsign(cs)
 
             # ❌ no mostrarme a mí mismo
-            if base in my_bases:
+            if base in _MY_BASES:
                 continue
 
             # ❌ descartar palabras sin dígitos (HEARTBEAT, TNX, etc.)
@@ -1588,7 +1732,7 @@ async def cmd_stations(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if GRID_FULL_RE.match(base):
                 continue
 
-            snr = e.get("snr")
+            snr = e.snr
             grid = _derive_grid(e)
 
             # distancia en km, si tenemos ambos grids
@@ -1596,21 +1740,25 @@ async def cmd_stations(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if my_grid and grid:
                 dist = grid_distance_km(my_grid, grid)
 
-            line_kwargs = {
-                "cs": cs,
-                "dist": f"{dist} km" if isinstance(dist, (int, float)) else "—",
-                "snr": f"{snr:+d}" if isinstance(snr, int) else "—",
-                "grid": grid or "",
-                "age": _age(e.get("utc") or e.get("ts")),
-            }
+            dist_txt = f"{dist} km" if isinstance(dist, (int, float)) else "—"
+            snr_txt = f"{snr:+d}" if isinstance(snr, int) else "—"
+            age = _age(e.utc or e.ts)
 
-            try:
-                line = line_tpl.format(**line_kwargs)
-            except Exception:
+            line = None
+            if line_fmt is not None:
+                try:
+                    line = line_fmt(cs=cs, dist=dist_txt, snr=snr_txt, grid=grid or "", age=age)
+                except (KeyError, IndexError):
+                    # la plantilla no cuadra con los campos: fallará igual en todas
+                    # las líneas, así que se pasa a None y no se reintenta
+                    line_fmt = None
+                except Exception:
+                    pass
+            if line is None:
                 # Fallback por si la plantilla no cuadra
-                #line = f"🗼 {cs:<10.10} {line_kwargs['dist']:<10.10} SNR:{line_kwargs['snr']:<4} GRID:{line_kwargs['grid']:<6} {line_kwargs['age']} ago"
+                #line = f"🗼 {cs:<10.10} {dist_txt:<10.10} SNR:{snr_txt:<4} GRID:{grid or '':<6} {age} ago"
                 # NO GRID info
-                line = f"🗼 {cs:<10.10} {line_kwargs['dist']:<10.10} SNR:{line_kwargs['snr']:<4} {line_kwargs['age']} ago"
+                line = f"🗼 {cs:<10.10} {dist_txt:<10.10} SNR:{snr_txt:<4} {age} ago"
 
             lines.append(line)
             count += 1
@@ -1743,12 +1891,62 @@ async def plain_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 # --------------- Telegram <-> JS8 bootstrap ---------------
 
+class DelayQueue:
+    """
+    Limita el ritmo de envíos a Telegram con ventanas deslizantes (como el
+    antiguo telegram.ext.messagequeue): 30 msg/s en total y 20 msg/min a grupos.
+    Así una ráfaga de JS8 se reparte en el tiempo en vez de acabar en errores 429.
+    submit() solo encola; la espera y el envío los hace run() en su propia tarea,
+    de modo que el lector de JS8 nunca se queda esperando a Telegram.
+    """
+    def __init__(self, burst_limit: int = 30, time_limit: float = 1.0,
+                 group_burst_limit: int = 20, group_time_limit: float = 60.0,
+                 maxsize: int = 1000):
+        self._all = (deque(), burst_limit, time_limit)
+        self._group = (deque(), group_burst_limit, group_time_limit)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)  # un único consumidor: se conserva el orden
+
+    def _sleep_needed(self, is_group: bool) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        for sent, limit, window in ((self._all, self._group) if is_group else (self._all,)):
+            # olvida los envíos que ya salieron de la ventana
+            while sent and now - sent[0] >= window:
+                sent.popleft()
+            if len(sent) >= limit:
+                wait = max(wait, window - (now - sent[0]))
+        return wait
+
+    def submit(self, chat_id: int, text: str, is_group: bool = False):
+        try:
+            self._queue.put_nowait((chat_id, text, is_group))
+        except asyncio.QueueFull:
+            logger.warning("Cola de envíos a Telegram llena; mensaje descartado.")
+
+    async def run(self):
+        while True:
+            chat_id, text, is_group = await self._queue.get()
+            try:
+                while (delay := self._sleep_needed(is_group)) > 0:
+                    await asyncio.sleep(delay)
+                now = time.monotonic()
+                self._all[0].append(now)
+                if is_group:
+                    self._group[0].append(now)
+                await APP.bot.send_message(chat_id=chat_id, text=text)
+            except Exception as e:
+                logger.error(f"No se pudo enviar a Telegram: {e}")
+            finally:
+                self._queue.task_done()
+
+
+DELAYQ = DelayQueue()
+
 async def send_to_telegram(text: str):
-    # Usamos el contexto global del Application
-    try:
-        await APP.bot.send_message(chat_id=config.TELEGRAM_CHAT_ID, text=text)
-    except Exception as e:
-        logger.error(f"No se pudo enviar a Telegram: {e}")
+    # Solo encola: DELAYQ.run (arrancada en on_startup) limita el ritmo y envía
+    chat_id = config.TELEGRAM_CHAT_ID
+    # En Telegram los grupos/canales tienen ID negativo
+    DELAYQ.submit(chat_id, text, is_group=chat_id < 0)
 
 async def background_js8_connector():
     """
@@ -1756,11 +1954,11 @@ async def background_js8_connector():
     """
     while True:
         try:
+            STATE.js8_disconnected.clear()
             await BRIDGE.start_js8()
             # Si es TCP, BRIDGE.start_js8 crea un read_loop que se mantiene.
-            # Esperamos a que caiga la conexión:
-            while STATE.js8_connected:
-                await asyncio.sleep(2)
+            # Esperamos (sin sondear) a que read_loop avise de que ha caído la conexión:
+            await STATE.js8_disconnected.wait()
         except Exception as e:
             STATE.js8_connected = False
             STATE.js8_last_error = str(e)
@@ -1769,6 +1967,7 @@ async def background_js8_connector():
 
 async def on_startup(app: Application):
     # Arranca tareas en segundo plano
+    asyncio.create_task(DELAYQ.run())
     asyncio.create_task(background_js8_connector())
     asyncio.create_task(poll_qso_text_loop())
     asyncio.create_task(poll_call_activity_loop())
@@ -1783,6 +1982,10 @@ def build_application() -> Application:
         read_timeout=getattr(config, "TG_READ_TIMEOUT", 60),
         write_timeout=getattr(config, "TG_WRITE_TIMEOUT", 60),
         # Nota: NO usar 'pool_limits' (no está soportado por HTTPXRequest en PTB 21.6)
+        # Pool más grande que el de 1 conexión por defecto: respuestas y reenvíos no se esperan entre sí
+        connection_pool_size=getattr(config, "TG_POOL_SIZE", 32),
+        pool_timeout=getattr(config, "TG_POOL_TIMEOUT", 5),
+        http_version="2" if h2 is not None else "1.1",
     )
 
     application = (
@@ -1793,6 +1996,9 @@ def build_application() -> Application:
         .build()
     )
 
+    # === Anti-duplicados (grupo -1: se evalúa antes que el resto) ===
+    application.add_handler(TypeHandler(Update, drop_duplicate_update), group=-1)
+
     # === Handlers de comandos ===
     application.add_handler(CommandHandler("help", cmd_help))
     application.add_handler(CommandHandler("status", cmd_status))
@@ -24,12 +24,16 @@ IGNORE_MESSAGES_FROM_SELF  = True                            # Para seguridad: e
 FORWARD_QSO_WINDOW         = True                            # activa el sondeo del QSO window
 QSO_POLL_SECONDS           = 2.0                             # intervalo de sondeo
 QSO_ID_CACHE_SIZE          = 2000                            # cuántos IDs recordamos para no duplicar
+INBOUND_DEDUP_SIZE         = 1000                            # cuántas entradas (JS8/Telegram) recordamos para descartar duplicados
+HEARD_MAX_SIZE             = 5000                            # máximo de estaciones oídas en memoria (se olvidan las más antiguas)
 
 # ======= TELEGRAM
 
 TG_CONNECT_TIMEOUT     = 20
 TG_READ_TIMEOUT        = 60
 TG_WRITE_TIMEOUT       = 60
+TG_POOL_SIZE           = 32                                  # conexiones simultáneas a la API de Telegram
+TG_POOL_TIMEOUT        = 5                                   # segundos esperando una conexión libre del pool
 
 
 # =================================================
@@ -12,12 +12,17 @@ def _load_strings():
         mod = import_module("i18n.strings_en")
     return getattr(mod, "STRINGS", {})
 
-def t(key: str, **kwargs) -> str:
-    strings = _load_strings()
-    s = strings.get(key)
+@lru_cache(maxsize=None)
+def template(key: str) -> str:
+    """Plantilla sin formatear (se resuelve una vez por clave)."""
+    s = _load_strings().get(key)
     if s is None:
         # fallback a EN si falta la clave
         s = import_module("i18n.strings_en").STRINGS.get(key, key)
+    return s
+
+def t(key: str, **kwargs) -> str:
+    s = template(key)
     try:
         return s.format(**kwargs)
     except Exception:
@@ -21,7 +21,7 @@ STRINGS = {
     ),
     "stations_none": "I haven't heard any station yet.",
     "stations_header": "📋 Recently heard (top {n}):",
-    "stations_line": "{cs:<10} {snr_txt:<8} {grid:<6} {age} ago",
+    "stations_line": "{cs:<10} {snr:<8} {grid:<6} {age} ago",
     "hb_sent": "🔴 Heartbeat sent:\n @HB {text}",
     "hb_usage": "Usage: /heartbeat or /hb",
     "to_usage": "Usage: /to CALLSIGN message",